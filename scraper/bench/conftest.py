@@ -0,0 +1,53 @@
+"""
+Shared fixtures for the benchmark suite.
+
+    python -m pytest bench --benchmark-autosave          # store a run
+    python -m pytest bench --benchmark-compare           # compare with the last one
+
+Runs are saved under ``.benchmarks`` keyed by machine, commit and time.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+
+from bench.site import SyntheticSite, render_posting, templates
+
+
+@pytest.fixture(scope="session")
+def fixture_pages() -> tuple[str, ...]:
+    return templates()
+
+
+@pytest.fixture(scope="session")
+def large_page() -> str:
+    """A posting padded to roughly 1 MB with unrelated markup."""
+    return render_posting(200_000, filler_kb=1024)
+
+
+@pytest.fixture
+def postings(monkeypatch):
+    """
+    The builder's postings collection on an in-memory mongomock client, with
+    description extraction answered locally instead of by Bedrock.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    import builder.main
+    from shared.mongo import get_database
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(builder.main, "get_mongo_client", lambda: client)
+    monkeypatch.setattr(
+        builder.main,
+        "extract_descriptions",
+        lambda descriptions: [{"furnished": True} for _ in descriptions],
+    )
+    return get_database(client)
+
+
+@pytest.fixture
+def site() -> Iterator[SyntheticSite]:
+    with SyntheticSite(listings=100, per_page=20) as running:
+        yield running
@@ -0,0 +1,138 @@
+"""
+Cold-start import benchmark for the Lambda handlers.
+
+Each handler module is imported in a fresh interpreter, the way a Lambda cold
+start would, and the time until its handler is importable is reported together
+with the slowest imports from ``python -X importtime``.
+
+    python -m bench.importtime
+    python -m bench.importtime --json > importtime.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Lambda entry points: module -> handler attribute
+HANDLERS = {
+    "main": "lambda_handler",
+    "queue_processor": "lambda_handler",
+    "builder.main": "handler",
+    "builder.enrichment": "handler",
+    "crawler.main": "main",
+}
+
+PROBE = """
+import time
+start = time.perf_counter()
+import importlib
+module = importlib.import_module({module!r})
+getattr(module, {attr!r})
+print(time.perf_counter() - start)
+"""
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    # Behave like Lambda: no .env lookup, no network at import.
+    env.setdefault("AWS_LAMBDA_FUNCTION_NAME", "importtime-bench")
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def time_import(module: str, attr: str, runs: int = 5) -> list[float]:
+    """Seconds until ``module.attr`` is available, once per fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, attr=attr)],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=ROOT,
+            env=_env(),
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def _importtime(code: str) -> dict[str, float]:
+    """Self import time in ms, summed per top-level package."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+        env=_env(),
+    )
+    packages: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header or unrelated output
+        top = fields[2].strip().split(".")[0]
+        packages[top] = packages.get(top, 0.0) + int(fields[0]) / 1000
+    return packages
+
+
+def top_imports(module: str, limit: int = 5) -> list[tuple[str, float]]:
+    """The packages that add the most import time to ``module``, in ms."""
+    baseline = _importtime("pass")
+    packages = _importtime(f"import {module}")
+    ranked = sorted(
+        ((name, ms) for name, ms in packages.items() if name not in baseline),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return [(name, round(ms, 1)) for name, ms in ranked[:limit]]
+
+
+def run(modules: list[str], runs: int) -> dict[str, dict[str, Any]]:
+    report = {}
+    for module in modules:
+        timings = time_import(module, HANDLERS[module], runs)
+        report[module] = {
+            "median_ms": round(statistics.median(timings) * 1000, 1),
+            "min_ms": round(min(timings) * 1000, 1),
+            "top_imports_ms": dict(top_imports(module)),
+        }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure handler cold-start import time")
+    parser.add_argument(
+        "modules", nargs="*", help=f"Handler modules (default: {', '.join(HANDLERS)})"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.modules) - set(HANDLERS)
+    if unknown:
+        parser.error(f"unknown handler modules: {', '.join(sorted(unknown))}")
+
+    report = run(args.modules or list(HANDLERS), args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    for module, stats in report.items():
+        top = ", ".join(f"{name} {ms}ms" for name, ms in stats["top_imports_ms"].items())
+        print(f"{module:20} {stats['median_ms']:8.1f} ms (min {stats['min_ms']:.1f})  {top}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
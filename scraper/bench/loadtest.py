@@ -0,0 +1,216 @@
+"""
+Offline load test of the whole pipeline: crawler -> queue producer -> consumer
+-> builder, against the synthetic site and in-process fakes.
+
+    python -m bench.loadtest --listings 2000 --latency 0.05 --error-rate 0.01
+    python -m bench.loadtest --consumers 4 --bedrock-latency 0.8 --json
+    python -m bench.loadtest --metrics      # also print the per-stage metrics line
+
+The crawler fetches from ``bench.site.SyntheticSite`` and hands each posting to
+a ``BatchProducer`` on ``FakeSQS`` (trimmed postings never need the S3
+offload). Consumer threads receive up to 10 messages at a time and pass them
+to the builder handler as an SQS event; the builder writes to a mongomock
+client and extracts descriptions with ``FakeBedrock``. Latency runs from the
+crawler handing a posting to the producer until the builder has written it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any
+
+import mongomock
+
+import crawler.main
+from builder import description_extractor, extraction_cache
+from builder.main import handler as builder_handler
+from shared import mongo
+from shared.metrics import invocation, metrics
+from shared.queue import BatchProducer
+from shared.test.fakes import FakeBedrock, FakeSQS
+
+from .site import SyntheticSite
+
+QUEUE_URL = "https://sqs.local/000000000000/scraper-loadtest"
+POLL_INTERVAL = 0.005
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of ``values``, or 0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+@contextmanager
+def fake_backends(bedrock: FakeBedrock) -> Iterator[mongomock.MongoClient]:
+    """
+    Point the shared Mongo client at a fresh mongomock client and Bedrock at
+    ``bedrock``, with an empty extraction cache so every run starts cold.
+    """
+    previous = mongo._client, description_extractor.get_bedrock_client, extraction_cache._cache
+    mongo._client = mongomock.MongoClient()
+    description_extractor.get_bedrock_client = lambda: bedrock
+    extraction_cache._cache = extraction_cache.ExtractionCache()
+    try:
+        yield mongo._client
+    finally:
+        (
+            mongo._client,
+            description_extractor.get_bedrock_client,
+            extraction_cache._cache,
+        ) = previous
+
+
+def run_pipeline(
+    listings: int = 500,
+    per_page: int = 20,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    consumers: int = 2,
+    concurrency: int = 8,
+    bedrock_latency: float = 0.0,
+    throttle_rate: float = 0.0,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Crawl a synthetic site of ``listings`` postings end to end and return the counts."""
+    sqs = FakeSQS()
+    bedrock = FakeBedrock(latency=bedrock_latency, throttle_rate=throttle_rate, seed=seed)
+    enqueued: dict[str, float] = {}
+    latencies: list[float] = []
+    counts = {"written": 0, "failed_messages": 0}
+    lock = threading.Lock()
+    crawled = threading.Event()
+
+    def consume() -> None:
+        while True:
+            # Check before receiving: once the crawl has finished and flushed,
+            # an empty receive means the queue is drained.
+            drained = crawled.is_set()
+            messages = sqs.receive_message(QueueUrl=QUEUE_URL, MaxNumberOfMessages=10).get(
+                "Messages", []
+            )
+            if not messages:
+                if drained:
+                    return
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            records = [{"messageId": m["MessageId"], "body": m["Body"]} for m in messages]
+            response = builder_handler({"Records": records})
+            finished = time.perf_counter()
+            failed = {failure["itemIdentifier"] for failure in response["batchItemFailures"]}
+            with lock:
+                for message in messages:
+                    if message["MessageId"] in failed:
+                        counts["failed_messages"] += 1
+                        continue
+                    listing_id = json.loads(message["Body"])["listing_id"]
+                    latencies.append(finished - enqueued[listing_id])
+                    counts["written"] += 1
+
+    with (
+        SyntheticSite(listings, per_page, latency, error_rate, seed) as site,
+        fake_backends(bedrock),
+    ):
+        original_api_url, crawler.main.API_URL = crawler.main.API_URL, site.url
+        threads = [threading.Thread(target=consume, daemon=True) for _ in range(consumers)]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            with BatchProducer(QUEUE_URL, sqs=sqs, bucket="") as producer:
+
+                def sink(listing_id: str, html: bytes, encoding: str) -> Future[bool]:
+                    enqueued[listing_id] = time.perf_counter()
+                    return producer.send(listing_id, html, encoding)
+
+                crawler.main.main(
+                    sink=sink,
+                    incremental=False,
+                    full_sweep=True,
+                    archive_location=None,
+                    concurrency=concurrency,
+                    rate_limit=0,
+                    flush_sink=producer.flush,
+                )
+            crawl_seconds = time.perf_counter() - started
+        finally:
+            crawled.set()
+            for thread in threads:
+                thread.join()
+            crawler.main.API_URL = original_api_url
+        seconds = time.perf_counter() - started
+
+    return {
+        "listings": listings,
+        "enqueued": len(enqueued),
+        **counts,
+        "send_failures": len(producer.failed),
+        "requests": site.requests,
+        "injected_errors": site.errors,
+        "bedrock_calls": bedrock.calls,
+        "crawl_seconds": round(crawl_seconds, 3),
+        "seconds": round(seconds, 3),
+        "listings_per_second": round(counts["written"] / seconds, 1) if seconds else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the pipeline against local fakes")
+    parser.add_argument("--listings", type=int, default=500, help="Postings on the site")
+    parser.add_argument("--per-page", type=int, default=20, help="Postings per index page")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503s")
+    parser.add_argument("--consumers", type=int, default=2, help="Concurrent builder consumers")
+    parser.add_argument("--concurrency", type=int, default=8, help="Crawler fetch threads")
+    parser.add_argument("--bedrock-latency", type=float, default=0.0, help="Seconds per call")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction throttled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", action="store_true", help="Print the per-stage metrics line")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR, format="%(levelname)s %(name)s: %(message)s")
+    # Nested entry points record into the outermost invocation, so with
+    # --metrics the whole run is reported as one line.
+    run = invocation("loadtest")(run_pipeline) if args.metrics else run_pipeline
+    metrics.enabled = args.metrics
+
+    result = run(
+        listings=args.listings,
+        per_page=args.per_page,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        consumers=args.consumers,
+        concurrency=args.concurrency,
+        bedrock_latency=args.bedrock_latency,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(
+            f"Wrote {result['written']}/{result['listings']} listings in {result['seconds']}s "
+            f"({result['listings_per_second']} listings/s, crawl {result['crawl_seconds']}s)\n"
+            f"Latency p50 {result['latency_p50_ms']} ms, p99 {result['latency_p99_ms']} ms\n"
+            f"{result['requests']} requests, {result['injected_errors']} injected errors, "
+            f"{result['failed_messages']} failed messages, {result['bedrock_calls']} Bedrock calls"
+        )
+    return 0 if result["written"] == result["listings"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,193 @@
+"""
+Local stand-in for the housing site, for benchmarks and load tests.
+
+Serves paginated ``/housing/page/N`` index pages and
+``/classified/housing/<id>/`` postings generated from the HTML fixtures in
+``builder/test/html``: each posting is a fixture with its own headline, price
+and description, so listings differ the way real ones do (and description
+extraction is not answered from the cache after the first few).
+
+    with SyntheticSite(listings=200, per_page=20) as site:
+        crawl(site.url)
+
+``python -m bench.site --listings 5000 --port 8000`` serves one on its own.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import threading
+import time
+from functools import cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "builder" / "test" / "html"
+
+PRICE = re.compile(r"(<strong>\s*)\$[^<]*?(\s*</strong>)")
+HEADLINE = re.compile(r"(<h1[^>]*>\s*)[^<]*?(\s*</h1>)")
+DETAILS = '<dl class="classified-details housing">'
+DESCRIPTION = '<dd class="description">'
+FILLER = '<div class="sidebar"><ul>' + '<li><a href="/ad">Sponsored</a></li>' * 40 + "</ul></div>"
+
+FIRST_LISTING_ID = 200_000
+
+
+@cache
+def templates() -> tuple[str, ...]:
+    return tuple(path.read_text(encoding="utf-8") for path in sorted(FIXTURES_DIR.glob("*.txt")))
+
+
+def render_posting(listing_id: int, filler_kb: int = 0) -> str:
+    """
+    A posting page for ``listing_id``. ``filler_kb`` adds roughly that many KB of
+    unrelated markup before the details block, to simulate heavy pages.
+    """
+    template = templates()[listing_id % len(templates())]
+    html = PRICE.sub(rf"\g<1>${500 + listing_id % 1500}\g<2>", template, count=1)
+    html = HEADLINE.sub(rf"\g<1>{listing_id} Synthetic St, Guelph\g<2>", html, count=1)
+    html = html.replace(
+        DESCRIPTION, f"{DESCRIPTION}Viewings for {listing_id} Synthetic St by appointment. ", 1
+    )
+    if filler_kb:
+        filler = FILLER * max(1, filler_kb * 1024 // len(FILLER))
+        html = html.replace(DETAILS, filler + DETAILS, 1)
+    return html
+
+
+def render_index(base_url: str, listing_ids: list[int]) -> str:
+    cards = "".join(
+        f'<article class="listing"><a href="{base_url}/classified/housing/{listing_id}/">'
+        f"{listing_id} Synthetic St</a><span>${500 + listing_id % 1500}</span></article>"
+        for listing_id in listing_ids
+    )
+    return f"<html><body><main>{cards}</main></body></html>"
+
+
+class SyntheticSite:
+    """
+    A threaded HTTP server for ``listings`` postings, ``per_page`` per index
+    page, newest (highest id) first. Every response is delayed by ``latency``
+    seconds, and an ``error_rate`` fraction of requests are answered with a
+    503 (drawn from a generator seeded with ``seed``).
+    """
+
+    def __init__(
+        self,
+        listings: int = 100,
+        per_page: int = 20,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        self.listings = listings
+        self.per_page = per_page
+        self.latency = latency
+        self.error_rate = error_rate
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._server: ThreadingHTTPServer | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "site is not running"
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def listing_ids(self) -> list[int]:
+        return list(range(FIRST_LISTING_ID + self.listings - 1, FIRST_LISTING_ID - 1, -1))
+
+    def respond(self, path: str) -> tuple[int, str]:
+        """Status and body for a request path."""
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts[:2] == ["housing", "page"] and len(parts) == 3 and parts[2].isdigit():
+            page = int(parts[2])
+            start = (page - 1) * self.per_page
+            return 200, render_index(self.url, self.listing_ids[start : start + self.per_page])
+        if parts[:2] == ["classified", "housing"] and len(parts) == 3 and parts[2].isdigit():
+            listing_id = int(parts[2])
+            if FIRST_LISTING_ID <= listing_id < FIRST_LISTING_ID + self.listings:
+                return 200, render_posting(listing_id)
+        return 404, "<html><body>Not found</body></html>"
+
+    def start(self) -> SyntheticSite:
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the crawler's session expects from the real site.
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                    failed = site._random.random() < site.error_rate
+                    site.errors += failed
+                if site.latency:
+                    time.sleep(site.latency)
+                if failed:
+                    status, body = 503, "<html><body>Service unavailable</body></html>"
+                else:
+                    status, body = site.respond(self.path)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        class Server(ThreadingHTTPServer):
+            # The default backlog of 5 drops connections under concurrent load,
+            # which shows up as one-second SYN retransmits.
+            request_queue_size = 128
+
+        self._server = Server(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> SyntheticSite:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the synthetic housing site")
+    parser.add_argument("--listings", type=int, default=1000, help="Number of postings")
+    parser.add_argument("--per-page", type=int, default=20, help="Postings per index page")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503s")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    site = SyntheticSite(
+        args.listings, args.per_page, args.latency, args.error_rate, port=args.port
+    ).start()
+    print(f"Serving {args.listings} listings at {site.url} (Ctrl-C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
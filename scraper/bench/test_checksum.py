@@ -0,0 +1,28 @@
+"""Checksum cost per listing."""
+
+from __future__ import annotations
+
+from builder.checksum import (
+    field_checksums,
+    fnv1a_32,
+    json_checksum_matches,
+    stable_stringify,
+)
+from builder.test.basic_parsing import EXPECTED_LISTINGS
+
+LISTINGS = list(EXPECTED_LISTINGS.values())
+
+
+def test_field_checksums(benchmark):
+    benchmark(lambda: [field_checksums(listing) for listing in LISTINGS])
+
+
+def test_legacy_checksum_matches(benchmark):
+    # Documents not yet migrated still carry a whole-listing FNV-1a checksum.
+    stored = [fnv1a_32(stable_stringify(listing)) for listing in LISTINGS]
+    benchmark(
+        lambda: [
+            json_checksum_matches(checksum, listing)
+            for checksum, listing in zip(stored, LISTINGS, strict=True)
+        ]
+    )
@@ -0,0 +1,14 @@
+"""The crawler's discovery and fetch pipeline against the local synthetic site."""
+
+from __future__ import annotations
+
+import crawler.main
+
+
+def test_crawl_synthetic_site(benchmark, monkeypatch, site):
+    monkeypatch.setattr(crawler.main, "API_URL", site.url)
+
+    def run():
+        return sum(1 for _ in crawler.main.iter_housing_postings(concurrency=8, rate_limit=1000))
+
+    assert benchmark(run) == site.listings
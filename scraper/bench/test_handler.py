@@ -0,0 +1,57 @@
+"""The builder handler end to end against mongomock."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from bench.site import render_posting
+from builder.main import handler
+from shared.queue import BatchProducer
+from shared.test.fakes import FakeSQS
+
+LISTING_IDS = range(200_000, 200_050)
+
+
+def test_handler_insert(benchmark, postings):
+    pages = [(str(listing_id), render_posting(listing_id)) for listing_id in LISTING_IDS]
+
+    def run():
+        postings.delete_many({})
+        for listing_id, html in pages:
+            handler({"listing_id": listing_id, "html_content": html})
+
+    benchmark(run)
+    assert postings.count_documents({}) == len(pages)
+
+
+@pytest.mark.usefixtures("postings")
+def test_handler_unchanged(benchmark):
+    pages = [(str(listing_id), render_posting(listing_id)) for listing_id in LISTING_IDS]
+    for listing_id, html in pages:
+        handler({"listing_id": listing_id, "html_content": html})
+
+    def run():
+        for listing_id, html in pages:
+            handler({"listing_id": listing_id, "html_content": html})
+
+    benchmark(run)
+
+
+def test_handler_sqs_batch(benchmark, postings):
+    sqs = FakeSQS()
+    with BatchProducer("bench", sqs=sqs, bucket="") as producer:
+        for listing_id in LISTING_IDS:
+            producer.send(str(listing_id), render_posting(listing_id))
+    records = [
+        {"messageId": str(i), "body": message["Body"]} for i, message in enumerate(sqs.messages)
+    ]
+
+    def run():
+        postings.delete_many({})
+        return handler({"Records": records})
+
+    result = benchmark(run)
+    assert result == {"batchItemFailures": []}
+    assert json.loads(json.dumps(result)) == result
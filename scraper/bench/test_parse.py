@@ -0,0 +1,27 @@
+"""Parser throughput on the fixtures and on a heavy synthetic page."""
+
+from __future__ import annotations
+
+import pytest
+
+from builder.parse_listings import parse_listing_html
+
+
+def test_parse_fixtures(benchmark, fixture_pages):
+    benchmark(lambda: [parse_listing_html(html) for html in fixture_pages])
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+def test_parse_fixture_backends(benchmark, fixture_pages, parser):
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    benchmark(lambda: [parse_listing_html(html, parser=parser) for html in fixture_pages])
+
+
+def test_parse_full_document(benchmark, fixture_pages):
+    benchmark(lambda: [parse_listing_html(html, full_document=True) for html in fixture_pages])
+
+
+def test_parse_large_page(benchmark, large_page):
+    listing = benchmark(parse_listing_html, large_page)
+    assert listing["price"] == "$1000"
@@ -0,0 +1,13 @@
+"""The whole pipeline, crawler to builder, against the synthetic site and fakes."""
+
+from __future__ import annotations
+
+from bench.loadtest import run_pipeline
+
+
+def test_pipeline_end_to_end(benchmark):
+    result = benchmark.pedantic(run_pipeline, kwargs={"listings": 100}, rounds=3)
+    assert result["written"] == result["listings"]
+    assert result["failed_messages"] == 0
+    # Descriptions differ per listing, so extraction is not served from the cache.
+    assert result["bedrock_calls"] > 1
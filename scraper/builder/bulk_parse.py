@@ -0,0 +1,179 @@
+"""
+Parse a directory (or glob) of listing HTML files on every core.
+
+    python -m builder.bulk_parse builder/test/html -o listings.ndjson
+    python -m builder.bulk_parse 'pages/**/*.html' -o listings.parquet --failures failed.ndjson
+
+Files are split into chunks that worker processes parse with
+``parse_listing_html``; results are written in input order as newline-delimited
+JSON, or as Parquet when the output ends in ``.parquet`` (needs the optional
+pyarrow package). Parquet rows also carry the typed ``ListingRecord`` fields,
+under a fixed schema so that every file has the same column types. The
+listing id of each file is its name without suffix.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, get_args, get_type_hints
+
+from .constants import FIELD_ALIASES
+from .parse_listings import parse_listing_html
+from .record import ListingRecord
+
+FileResult = tuple[str, dict[str, Any] | None, str | None]
+
+# Parsed fields that are not display strings
+FEATURE_FIELDS = {"parking", "no_smoking", "laundry_facilities", "cooking_facilities"}
+LIST_FIELDS = {"photos"}
+
+
+def collect_files(sources: Iterable[str], pattern: str = "*") -> list[Path]:
+    """Expand directories (recursively, filtered by ``pattern``) and globs into files."""
+    files: list[Path] = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            files.extend(p for p in sorted(path.rglob(pattern)) if p.is_file())
+        elif path.is_file():
+            files.append(path)
+        else:
+            files.extend(Path(p) for p in sorted(glob.glob(source, recursive=True)))
+    return [path for path in files if path.is_file()]
+
+
+def parse_files(paths: list[str]) -> list[FileResult]:
+    """Worker: parse one chunk of files, returning ``(path, listing, error)``."""
+    results: list[FileResult] = []
+    for path in paths:
+        try:
+            # Bytes let BeautifulSoup pick up the document's declared encoding.
+            listing = parse_listing_html(Path(path).read_bytes())
+        except Exception as exc:
+            results.append((path, None, f"{type(exc).__name__}: {exc}"))
+            continue
+        listing.setdefault("listing_id", Path(path).stem)
+        results.append((path, listing, None))
+    return results
+
+
+def bulk_parse(
+    files: list[Path], workers: int | None = None, chunk_size: int = 64
+) -> Iterator[FileResult]:
+    """Parse ``files`` on a process pool and yield the results in input order."""
+    workers = workers or os.cpu_count() or 1
+    chunks = (
+        [str(path) for path in files[start : start + chunk_size]]
+        for start in range(0, len(files), chunk_size)
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of chunks in flight so memory does not grow
+        # with the number of files.
+        in_flight: deque[Future[list[FileResult]]] = deque()
+        while True:
+            while len(in_flight) < 2 * workers and (chunk := next(chunks, None)) is not None:
+                in_flight.append(executor.submit(parse_files, chunk))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+
+
+def parquet_schema(pa: Any) -> Any:
+    """Columns of the Parquet output: the parsed fields, then the ``ListingRecord`` ones."""
+    columns = []
+    for name in FIELD_ALIASES:
+        if name in FEATURE_FIELDS:
+            columns.append(pa.field(name, pa.bool_()))
+        elif name in LIST_FIELDS:
+            columns.append(pa.field(name, pa.list_(pa.string())))
+        else:
+            columns.append(pa.field(name, pa.string()))
+
+    record_types = {
+        int: pa.int64(),
+        bool: pa.bool_(),
+        datetime: pa.timestamp("us", tz="UTC"),
+    }
+    hints = get_type_hints(ListingRecord)
+    for field in fields(ListingRecord):
+        # Every typed field is optional: ``X | None``.
+        kind = next(arg for arg in get_args(hints[field.name]) if arg is not type(None))
+        columns.append(pa.field(field.name, record_types[kind]))
+    columns.append(pa.field("record_version", pa.int32()))
+    return pa.schema(columns)
+
+
+def write_parquet(path: str, rows: list[dict[str, Any]]) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise SystemExit("Parquet output needs pyarrow: pip install 'scraper[parquet]'") from exc
+
+    records = [{**row, **ListingRecord.from_listing(row).to_document()} for row in rows]
+    pq.write_table(pa.Table.from_pylist(records, schema=parquet_schema(pa)), path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parse listing HTML files in parallel")
+    parser.add_argument("sources", nargs="+", help="Directories, files or glob patterns")
+    parser.add_argument(
+        "-o", "--output", default="-", help="NDJSON or .parquet file (default: stdout)"
+    )
+    parser.add_argument("--pattern", default="*", help="File pattern inside directories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Files per work unit")
+    parser.add_argument("--failures", help="Write per-file failures to this NDJSON file")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.sources, args.pattern)
+    if not files:
+        print("[ERROR] No input files found", file=sys.stderr)
+        return 1
+
+    parquet = args.output.endswith(".parquet")
+    rows: list[dict[str, Any]] = []
+    failures: list[dict[str, str]] = []
+    started = time.perf_counter()
+
+    to_file = not parquet and args.output != "-"
+    with open(args.output, "w", encoding="utf-8") if to_file else nullcontext(sys.stdout) as out:
+        for path, listing, error in bulk_parse(files, args.workers, args.chunk_size):
+            if listing is None:
+                failures.append({"path": path, "error": error or ""})
+                print(f"[ERROR] {path}: {error}", file=sys.stderr)
+            elif parquet:
+                rows.append(listing)
+            else:
+                out.write(json.dumps(listing, ensure_ascii=False) + "\n")
+
+    if parquet:
+        write_parquet(args.output, rows)
+    if args.failures:
+        with open(args.failures, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(failure) + "\n" for failure in failures)
+
+    elapsed = time.perf_counter() - started
+    parsed = len(files) - len(failures)
+    print(
+        f"Parsed {parsed}/{len(files)} files in {elapsed:.2f}s "
+        f"({parsed / elapsed if elapsed else 0:.0f} files/s), {len(failures)} failed",
+        file=sys.stderr,
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
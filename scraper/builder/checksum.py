@@ -1,6 +1,15 @@
+import hashlib
 import json
+from collections.abc import Callable
 from typing import Any
 
+# Listings are compared through per-field hashes (``field_checksums``), stored
+# bare (no algorithm prefix) to keep documents small. Documents written before
+# that carry whole-listing checksums, either "<algorithm>:<hex digest>" or an
+# older bare 32-bit FNV-1a integer; they are only read (``*_matches``) until the
+# builder migrates the document.
+FIELD_HASH_ALGORITHM = "blake2b-64"
+
 
 def stable_stringify(data: Any) -> str:
     """
@@ -15,28 +24,63 @@ def fnv1a_32(text: str) -> int:
     """
     32-bit FNV-1a hash -> returns unsigned 32-bit integer
     Order-sensitive: even one character difference changes the checksum.
+
+    Legacy: only used to recognise checksums stored before the switch to blake2b.
     """
     FNV_PRIME = 0x01000193
     hash_val = 0x811C9DC5  # offset basis
 
     for char in text:
         hash_val ^= ord(char)
-        hash_val = (hash_val * FNV_PRIME) % (2**32)
+        hash_val = (hash_val * FNV_PRIME) & 0xFFFFFFFF
 
     return hash_val
 
 
-def json_checksum(data: Any) -> int:
+def _blake2b(digest_size: int) -> Callable[[str], str]:
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=digest_size).hexdigest()
+
+    return digest
+
+
+ALGORITHMS: dict[str, Callable[[str], str]] = {
+    "blake2b-64": _blake2b(8),
+    "blake2b-128": _blake2b(16),
+}
+
+
+def checksum_matches(stored: Any, text: str) -> bool:
     """
-    Compute a deterministic unsigned 32-bit checksum for a JSON-serializable object.
+    Check ``text`` against a stored checksum of any supported format, so that
+    documents checksummed with an older algorithm are not seen as changed.
     """
-    canonical = stable_stringify(data)
-    return fnv1a_32(canonical)
+    if isinstance(stored, int):
+        return fnv1a_32(text) == stored
+    if not isinstance(stored, str):
+        return False
+
+    algorithm, _, value = stored.partition(":")
+    digest = ALGORITHMS.get(algorithm)
+    return digest is not None and digest(text) == value
+
+
+def json_checksum_matches(stored: Any, data: Any) -> bool:
+    return checksum_matches(stored, stable_stringify(data))
+
+
+def string_checksum_matches(stored: Any, s: str) -> bool:
+    return checksum_matches(stored, s)
 
 
-def string_checksum(s: str) -> int:
+def field_checksums(data: dict[str, Any]) -> dict[str, str]:
     """
-    Compute a deterministic unsigned 32-bit checksum for a string.
-    Order matters: even one character change produces a different checksum.
+    Hash each top-level field of ``data`` separately, so a stored document can
+    be compared field by field. Values that are not JSON types (e.g. datetimes)
+    are hashed by their string form.
     """
-    return fnv1a_32(s)
+    digest = ALGORITHMS[FIELD_HASH_ALGORITHM]
+    return {
+        field: digest(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str))
+        for field, value in data.items()
+    }
@@ -2,79 +2,456 @@ from __future__ import annotations
 
 import json
 import logging
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from typing import Any
 
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-from dotenv import load_dotenv
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    HTTPClientError,
+)
 
-# Load environment variables from .env file
-load_dotenv()
+from shared.config import load_local_env
+from shared.metrics import incr
+
+from .extraction_cache import cache_key, get_extraction_cache
 
-# Create the Bedrock client
-client = boto3.client(service_name="bedrock-runtime", region_name="us-east-1")
+# Load environment variables from .env file
+load_local_env()
 
 # Define the model
 model_id = "openai.gpt-oss-20b-1:0"
 
+# Bump whenever the system prompt or output handling changes so cached
+# extractions from the old prompt are not reused.
+PROMPT_VERSION = "1"
+
+# Concurrent Bedrock calls made by extract_descriptions
+MAX_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "4"))
+# Descriptions up to PACK_MAX_CHARS are sent PACK_SIZE at a time in one prompt
+PACK_SIZE = int(os.getenv("EXTRACTION_PACK_SIZE", "5"))
+PACK_MAX_CHARS = int(os.getenv("EXTRACTION_PACK_MAX_CHARS", "800"))
+
+# converse is the only retry layer: the botocore client makes a single attempt.
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 20.0
+THROTTLING_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+# Transient server errors botocore would otherwise have retried
+TRANSIENT_CODES = THROTTLING_CODES | {"InternalServerException", "ModelTimeoutException"}
+# Connection failures and timeouts (HTTPClientError covers read timeouts and
+# closed connections)
+TRANSIENT_ERRORS = (EndpointConnectionError, ConnectTimeoutError, HTTPClientError)
+
+FIELDS_PROMPT = (
+    "demographic: string; // 'woman', 'mixed', 'man', 'null'.\n"
+    "term_length: int; // term length in months. if not stated place 'null'\n"
+    "term_length_type: string; // 'winter', 'spring', 'summer', 'fall', 'null'\n"
+    "furnished: bool; // true / false\n"
+    'Ex: "3min walk to the Mall", "12 min bus, or 30 minute walk to Campus"\n'
+)
+
+SINGLE_PROMPT = (
+    "You are given the description for a lease posting. Return ONLY a json object containing fields. "
+    "DO NOT INCLUDE ANY TEXT. ONLY RETURN THE JSON. Extract the following fields from the description. "
+    "Only include fields that are EXCPLICITLY stated.\n\n" + FIELDS_PROMPT
+)
+
+PACKED_PROMPT = (
+    "You are given several numbered descriptions for lease postings. Return ONLY a json array with "
+    "exactly one object per description, in the same order. DO NOT INCLUDE ANY TEXT. ONLY RETURN THE "
+    "JSON. Extract the following fields from each description. Only include fields that are "
+    "EXCPLICITLY stated.\n\n" + FIELDS_PROMPT
+)
+
 logger = logging.getLogger(__name__)
 
 
-def extract_description(description: str) -> dict[str, Any]:
-    if not description or not description.strip():
-        return {}
+@cache
+def get_bedrock_client():
+    """
+    Create the Bedrock client on first use. boto3 is imported here so that
+    handlers which never call the model do not pay for it on cold start.
+    Adaptive mode rate-limits on the client side once Bedrock starts throttling;
+    botocore's own retries are off because ``converse`` retries with jitter.
+    """
+    import boto3
+    from botocore.config import Config
 
-    messages = [
-        {
-            "role": "user",
-            "content": [{"text": description}],
-        }
-    ]
+    return boto3.client(
+        service_name="bedrock-runtime",
+        region_name="us-east-1",
+        config=Config(retries={"mode": "adaptive", "max_attempts": 1}),
+    )
 
-    system = [
-        {
-            "text": (
-                "You are given the description for a lease posting. Return ONLY a json object containing fields. "
-                "DO NOT INCLUDE ANY TEXT. ONLY RETURN THE JSON. Extract the following fields from the description. "
-                "Only include fields that are EXCPLICITLY stated.\n\n"
-                "demographic: string; // 'woman', 'mixed', 'man', 'null'.\n"
-                "term_length: int; // term length in months. if not stated place 'null'\n"
-                "term_length_type: string; // 'winter', 'spring', 'summer', 'fall', 'null'\n"
-                "furnished: bool; // true / false\n"
-                'Ex: "3min walk to the Mall", "12 min bus, or 30 minute walk to Campus"\n'
-            )
-        }
-    ]
 
-    inference_config = {
-        "maxTokens": 1000,
+# ---------------------------------------------------------------------------
+# Rule-based pre-extraction
+# ---------------------------------------------------------------------------
+
+# Fields whose rule confidence is at least this are not sent to the model.
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv("EXTRACTION_RULE_CONFIDENCE", "0.8"))
+
+EXTRACTED_FIELDS = ("demographic", "term_length", "term_length_type", "furnished")
+
+MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+MONTH_PATTERN = (
+    r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+# Academic terms by starting month
+TERM_BY_START_MONTH = {
+    **dict.fromkeys((1, 2, 3, 4), "winter"),
+    **dict.fromkeys((5, 6, 7, 8), "summer"),
+    **dict.fromkeys((9, 10, 11, 12), "fall"),
+}
+
+DEMOGRAPHIC_KEYWORDS = {
+    "woman": re.compile(r"\b(girls?|females?|wom[ae]n|lad(?:y|ies)|sorority)\b", re.IGNORECASE),
+    "man": re.compile(r"\b(guys|boys?|males?|men|gentlemen|fraternity)\b", re.IGNORECASE),
+    "mixed": re.compile(
+        r"\b(co-?ed|mixed|males? (?:and|&|or) females?|females? (?:and|&|or) males?"
+        r"|guys (?:and|&) girls|girls (?:and|&) guys)\b",
+        re.IGNORECASE,
+    ),
+}
+UNFURNISHED = re.compile(
+    r"\b(unfurnished|not furnished|no furniture|without furniture)\b", re.IGNORECASE
+)
+PARTLY_FURNISHED = re.compile(r"\b(semi|partially|partly)[- ]furnished\b", re.IGNORECASE)
+FURNISHED = re.compile(r"\b(furnished|furniture (?:is )?included)\b", re.IGNORECASE)
+MONTH_COUNT = re.compile(r"\b(\d{1,2})[- ]?months?\b", re.IGNORECASE)
+YEAR_COUNT = re.compile(r"\b(\d|one|a)[- ]?(?:years?|yr)\b(?![- ]old)", re.IGNORECASE)
+MONTH_RANGE = re.compile(
+    rf"\b{MONTH_PATTERN}\.?(?:\s+\d{{1,2}}(?:st|nd|rd|th)?)?,?(?:\s+\d{{4}})?"
+    rf"\s*(?:-|–|to|through|until|till)\s*{MONTH_PATTERN}\b",
+    re.IGNORECASE,
+)
+MONTH_MENTION = re.compile(rf"\b{MONTH_PATTERN}\b(?!\s+(?:be|not|have|need)\b)", re.IGNORECASE)
+SEASON = re.compile(r"\b(winter|spring|summer|fall|autumn)\b", re.IGNORECASE)
+TERM_CUE = re.compile(r"\b(semesters?|terms?|school year|academic year)\b", re.IGNORECASE)
+
+
+def _month_number(name: str) -> int:
+    return MONTHS[name[:3].casefold()]
+
+
+def _rule_demographic(text: str) -> tuple[Any, float]:
+    if DEMOGRAPHIC_KEYWORDS["mixed"].search(text):
+        return "mixed", 0.9
+    woman = bool(DEMOGRAPHIC_KEYWORDS["woman"].search(text))
+    man = bool(DEMOGRAPHIC_KEYWORDS["man"].search(text))
+    if woman and man:
+        return None, 0.4
+    if woman:
+        return "woman", 0.85
+    if man:
+        return "man", 0.85
+    return None, 0.85
+
+
+def _rule_furnished(text: str) -> tuple[Any, float]:
+    unfurnished = bool(UNFURNISHED.search(text))
+    furnished = bool(FURNISHED.search(UNFURNISHED.sub("", text)))
+    if unfurnished and furnished:
+        return None, 0.4
+    if unfurnished:
+        return False, 0.95
+    if PARTLY_FURNISHED.search(text):
+        return True, 0.6
+    if furnished:
+        return True, 0.9
+    return None, 0.85
+
+
+def _rule_term_length(text: str) -> tuple[Any, float]:
+    counts = {int(match) for match in MONTH_COUNT.findall(text)}
+    for match in YEAR_COUNT.findall(text):
+        years = 1 if match.casefold() in ("one", "a") else int(match)
+        counts.add(12 * years)
+
+    ranges = {
+        (_month_number(start), _month_number(end)) for start, end in MONTH_RANGE.findall(text)
     }
+    range_lengths = {(end - start) % 12 + 1 for start, end in ranges}
+
+    if len(counts) > 1 or len(range_lengths) > 1:
+        return None, 0.4
+    if counts and range_lengths:
+        return (counts.pop(), 0.95) if counts == range_lengths else (None, 0.4)
+    if counts:
+        return counts.pop(), 0.85
+    if range_lengths:
+        return range_lengths.pop(), 0.85
+    if TERM_CUE.search(text):
+        return None, 0.5
+    return None, 0.85
+
+
+def _rule_term_length_type(text: str) -> tuple[Any, float]:
+    seasons = {
+        "fall" if season.casefold() == "autumn" else season.casefold()
+        for season in SEASON.findall(text)
+    }
+    if len(seasons) > 1:
+        return None, 0.4
+    if seasons:
+        return seasons.pop(), 0.85
+
+    starts = {TERM_BY_START_MONTH[_month_number(start)] for start, _ in MONTH_RANGE.findall(text)}
+    if len(starts) == 1:
+        return starts.pop(), 0.8
+    if starts or MONTH_MENTION.search(text) or TERM_CUE.search(text):
+        return None, 0.5
+    return None, 0.85
+
+
+FIELD_RULES = {
+    "demographic": _rule_demographic,
+    "term_length": _rule_term_length,
+    "term_length_type": _rule_term_length_type,
+    "furnished": _rule_furnished,
+}
+
+
+def pre_extract(description: str) -> dict[str, tuple[Any, float]]:
+    """
+    Read the extracted fields straight from the description with keyword
+    tables and regexes. Returns ``(value, confidence)`` per field, where a
+    ``None`` value means the field is not stated.
+    """
+    return {field: rule(description) for field, rule in FIELD_RULES.items()}
 
-    try:
-        response = client.converse(
-            modelId=model_id,
-            messages=messages,
-            system=system,
-            inferenceConfig=inference_config,
-        )
+
+def split_rule_results(
+    results: dict[str, tuple[Any, float]], threshold: float = RULE_CONFIDENCE_THRESHOLD
+) -> tuple[dict[str, Any], set[str]]:
+    """
+    Split rule results into confidently resolved fields (omitting those that
+    are not stated) and the fields that still need the model.
+    """
+    resolved: dict[str, Any] = {}
+    unresolved: set[str] = set()
+    for field, (value, confidence) in results.items():
+        if confidence < threshold:
+            unresolved.add(field)
+        elif value is not None:
+            resolved[field] = value
+    return resolved, unresolved
+
+
+def extract_description(description: str) -> dict[str, Any] | None:
+    return extract_descriptions([description])[0]
+
+
+def extract_descriptions(
+    descriptions: list[str],
+    bedrock_client=None,
+    max_workers: int = MAX_CONCURRENCY,
+    use_rules: bool = True,
+) -> list[dict[str, Any] | None]:
+    """
+    Extract fields for many descriptions at once, returning results in order.
+
+    The rule-based pre-extractor runs first; a description only reaches the
+    model when some field could not be resolved confidently, and then only
+    those fields are taken from the model's answer. Cached and duplicate
+    descriptions are resolved without a call. The rest run on a bounded thread
+    pool, with short descriptions packed several to a prompt. A packed call
+    that fails or returns the wrong shape falls back to one call per
+    description.
+
+    A description that needed the model but whose call failed (including
+    after throttling retries) comes back as ``None`` rather than with partial
+    fields, so callers can leave it for a later retry.
+    """
+    cache = get_extraction_cache()
+    results: list[dict[str, Any] | None] = [{} for _ in descriptions]
+    # Per description: fields resolved by rules, and the fields to take from the model
+    rule_fields: list[tuple[dict[str, Any], set[str] | None]] = [({}, None)] * len(descriptions)
+    pending: dict[str, tuple[str, list[int]]] = {}
+
+    def merge(index: int, model_fields: dict[str, Any]) -> dict[str, Any]:
+        resolved, unresolved = rule_fields[index]
+        if unresolved is None:
+            return dict(model_fields)
+        taken = {k: v for k, v in model_fields.items() if k in unresolved}
+        return {**taken, **resolved}
+
+    for index, description in enumerate(descriptions):
+        if not description or not description.strip():
+            continue
+        if use_rules:
+            resolved, unresolved = split_rule_results(pre_extract(description))
+            rule_fields[index] = (resolved, unresolved)
+            if not unresolved:
+                results[index] = resolved
+                incr("extract_rules_only")
+                continue
+
+        key = cache_key(description, model_id, PROMPT_VERSION)
+        if key in pending:
+            pending[key][1].append(index)
+            continue
+        cached = cache.get(key)
+        if cached is not None:
+            results[index] = merge(index, cached)
+            incr("extract_cache_hits")
+        else:
+            pending[key] = (description, [index])
+            incr("extract_cache_misses")
+
+    short = [key for key, (text, _) in pending.items() if len(text) <= PACK_MAX_CHARS]
+    long = [key for key in pending if len(pending[key][0]) > PACK_MAX_CHARS]
+    groups = [short[i : i + PACK_SIZE] for i in range(0, len(short), PACK_SIZE)]
+    groups += [[key] for key in long]
+    incr("extract_model_groups", len(groups))
+
+    def run(group: list[str]) -> list[dict[str, Any] | None]:
+        texts = [pending[key][0] for key in group]
+        if len(texts) > 1:
+            packed = invoke_model_packed(texts, bedrock_client)
+            if packed is not None:
+                return packed
+        return [invoke_model(text, bedrock_client) for text in texts]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for group, extracted in zip(groups, executor.map(run, groups), strict=True):
+            for key, fields in zip(group, extracted, strict=True):
+                if fields is None:
+                    incr("extract_model_failures")
+                    for index in pending[key][1]:
+                        results[index] = None
+                    continue
+                cache.put(key, fields)
+                for index in pending[key][1]:
+                    results[index] = merge(index, fields)
+
+    return results
+
+
+def converse(messages: list[dict[str, Any]], system_prompt: str, bedrock_client=None) -> str | None:
+    """
+    Call Bedrock ``converse`` and return the first non-empty text block.
+    Throttling, transient server errors, timeouts and dropped connections are
+    retried with full-jitter exponential backoff.
+    """
+    bedrock_client = bedrock_client or get_bedrock_client()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        incr("bedrock_calls")
+        try:
+            response = bedrock_client.converse(
+                modelId=model_id,
+                messages=messages,
+                system=[{"text": system_prompt}],
+                inferenceConfig={"maxTokens": 1000},
+            )
+        except ClientError as exc:
+            code = exc.response.get("Error", {}).get("Code")
+            if code not in TRANSIENT_CODES or attempt == MAX_ATTEMPTS:
+                raise
+            if code in THROTTLING_CODES:
+                incr("bedrock_throttled")
+            time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt)))
+            continue
+        except TRANSIENT_ERRORS:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            incr("bedrock_connection_errors")
+            time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt)))
+            continue
 
         content = response.get("output", {}).get("message", {}).get("content", [])
         text_blocks = [
             block.get("text") for block in content if isinstance(block, dict) and block.get("text")
         ]
-        raw_payload = next((text for text in text_blocks if text.strip()), "")
+        return next((text for text in text_blocks if text.strip()), None)
+
+    return None
+
+
+def clean_fields(payload: Any) -> dict[str, Any]:
+    if isinstance(payload, dict):
+        return {k: v for k, v in payload.items() if v is not None and v != "null"}
+    return {}
+
+
+def invoke_model(description: str, bedrock_client=None) -> dict[str, Any] | None:
+    """
+    Ask the model to extract fields from ``description``. Returns ``None`` when
+    the call or its payload failed, so failures are not cached.
+    """
+    messages = [
+        {
+            "role": "user",
+            "content": [{"text": description}],
+        }
+    ]
+
+    try:
+        raw_payload = converse(messages, SINGLE_PROMPT, bedrock_client)
         if not raw_payload:
-            return {}
+            return None
 
         json_response = json.loads(raw_payload)
     except (BotoCoreError, ClientError) as exc:
         logger.info("Bedrock description extraction failed: %s", exc, exc_info=True)
-        return {}
+        return None
     except (KeyError, IndexError, TypeError, json.JSONDecodeError) as exc:
         logger.info("Unable to parse description extraction payload: %s", exc, exc_info=True)
-        return {}
+        return None
 
-    if isinstance(json_response, dict):
-        return {k: v for k, v in json_response.items() if v is not None and v != "null"}
+    return clean_fields(json_response)
 
-    return {}
+
+def invoke_model_packed(
+    descriptions: list[str], bedrock_client=None
+) -> list[dict[str, Any]] | None:
+    """
+    Extract fields for several descriptions with one prompt. Returns ``None``
+    unless the model answers with one object per description.
+    """
+    numbered = "\n\n".join(f"{i}. {text}" for i, text in enumerate(descriptions, start=1))
+    messages = [{"role": "user", "content": [{"text": numbered}]}]
+
+    try:
+        raw_payload = converse(messages, PACKED_PROMPT, bedrock_client)
+        if not raw_payload:
+            return None
+
+        json_response = json.loads(raw_payload)
+    except (BotoCoreError, ClientError) as exc:
+        logger.info("Bedrock packed extraction failed: %s", exc, exc_info=True)
+        return None
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as exc:
+        logger.info("Unable to parse packed extraction payload: %s", exc, exc_info=True)
+        return None
+
+    if not isinstance(json_response, list) or len(json_response) != len(descriptions):
+        return None
+    return [clean_fields(item) for item in json_response]
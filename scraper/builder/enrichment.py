@@ -0,0 +1,148 @@
+"""
+Deferred description enrichment.
+
+In ``ENRICHMENT_MODE=deferred`` the builder writes listings straight away with
+``enrichment_status: pending``. This worker picks pending listings up in
+batches, runs the extraction and ``$set``s the extracted fields.
+
+Listings whose extraction failed (Bedrock errors or throttling) stay pending
+with an attempt count and are not picked up again until a backoff has
+passed, so an outage delays enrichment instead of marking listings done.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from pymongo import UpdateOne
+
+from shared.metrics import incr, invocation, span
+from shared.mongo import get_database, get_mongo_client
+
+from .description_extractor import extract_descriptions
+
+PENDING = "pending"
+DONE = "done"
+
+BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", "50"))
+# Set ENRICHMENT_PAUSED=1 to stop enrichment, e.g. while Bedrock is throttling.
+PAUSED = os.getenv("ENRICHMENT_PAUSED", "0") == "1"
+# Failed listings are retried after RETRY_DELAY * 2^(attempts - 1), up to MAX_RETRY_DELAY.
+RETRY_DELAY = timedelta(seconds=float(os.getenv("ENRICHMENT_RETRY_SECONDS", "300")))
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+logger = logging.getLogger(__name__)
+
+
+def pending_fields() -> dict[str, Any]:
+    """Fields that queue a listing for enrichment, clearing any earlier failures."""
+    return {"enrichment_status": PENDING, "enrichment_attempts": 0, "enrichment_retry_at": None}
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def retry_fields(doc: dict[str, Any], now: datetime) -> dict[str, Any]:
+    """Fields that keep a failed listing pending until its next retry is due."""
+    attempts = (doc.get("enrichment_attempts") or 0) + 1
+    return {"enrichment_attempts": attempts, "enrichment_retry_at": now + retry_delay(attempts)}
+
+
+def is_due(doc: dict[str, Any] | None, now: datetime) -> bool:
+    """Whether a stored listing is pending and its retry (if any) is due."""
+    if doc is None or doc.get("enrichment_status") != PENDING:
+        return False
+    retry_at = doc.get("enrichment_retry_at")
+    if retry_at is None:
+        return True
+    # Mongo returns naive UTC datetimes unless the client is tz-aware.
+    return (retry_at if retry_at.tzinfo else retry_at.replace(tzinfo=UTC)) <= now
+
+
+def enrich_pending(collection, batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    """
+    Extract and store fields for one batch of pending listings that are due.
+
+    Each update is conditional on the description hash read at the start,
+    so a listing whose description changed in the meantime stays pending for
+    the next run instead of receiving stale fields. Listings whose extraction
+    failed stay pending with their retry pushed back.
+    """
+    now = datetime.now(UTC)
+    with span("db_read"):
+        docs = list(
+            collection.find(
+                {
+                    "enrichment_status": PENDING,
+                    "$or": [
+                        {"enrichment_retry_at": None},
+                        {"enrichment_retry_at": {"$lte": now}},
+                    ],
+                },
+                {"description": 1, "field_hashes.description": 1, "enrichment_attempts": 1},
+            ).limit(batch_size)
+        )
+    if not docs:
+        return {"pending": 0, "enriched": 0, "failed": 0}
+
+    with span("extract"):
+        extracted = extract_descriptions([doc.get("description") or "" for doc in docs])
+    operations = []
+    failed = 0
+    for doc, fields in zip(docs, extracted, strict=True):
+        condition = {
+            "_id": doc["_id"],
+            "enrichment_status": PENDING,
+            "field_hashes.description": doc.get("field_hashes", {}).get("description"),
+        }
+        if fields is None:
+            failed += 1
+            update = retry_fields(doc, now)
+        else:
+            update = {**fields, "enrichment_status": DONE}
+        operations.append(UpdateOne(condition, {"$set": update}))
+    with span("db_write"):
+        collection.bulk_write(operations, ordered=False)
+    return {"pending": len(docs), "enriched": len(docs) - failed, "failed": failed}
+
+
+@invocation("enrichment")
+def handler(event: dict[str, Any], context: Any | None = None) -> dict[str, Any]:
+    """
+    Scheduled entry point. Works through pending listings, ``batch_size`` at a
+    time, until none are due, the event's ``max_batches`` is reached, a whole
+    batch fails or the invocation is nearly out of time.
+    """
+    if PAUSED:
+        logger.info("Enrichment is paused")
+        return {"statusCode": 200, "body": json.dumps({"paused": True})}
+
+    collection = get_database(get_mongo_client())
+    max_batches = int(event.get("max_batches", 20))
+    batch_size = int(event.get("batch_size", BATCH_SIZE))
+    totals = {"pending": 0, "enriched": 0, "failed": 0, "batches": 0}
+
+    for _ in range(max_batches):
+        if context is not None and context.get_remaining_time_in_millis() < 60_000:
+            break
+        counts = enrich_pending(collection, batch_size)
+        if not counts["pending"]:
+            break
+        totals["pending"] += counts["pending"]
+        totals["enriched"] += counts["enriched"]
+        totals["failed"] += counts["failed"]
+        totals["batches"] += 1
+        if counts["failed"] and not counts["enriched"]:
+            # Nothing in the batch succeeded: Bedrock is most likely down or
+            # throttling, so leave the rest for the next scheduled run.
+            logger.warning("Stopping enrichment after a batch with no successful extraction")
+            break
+
+    for name, value in totals.items():
+        incr(f"enrichment_{name}", value)
+    return {"statusCode": 200, "body": json.dumps(totals)}
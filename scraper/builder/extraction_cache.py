@@ -0,0 +1,183 @@
+"""
+Content-addressed cache for description extraction results.
+
+Entries are keyed by a hash of the normalised description, the model id and
+the prompt version, so a prompt or model change naturally misses the cache.
+Lookups go through an in-process LRU first and then a durable Mongo tier that
+survives cold starts and is shared between Lambda instances.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from pymongo import ASCENDING, IndexModel
+
+from shared.mongo import get_extraction_cache_collection, get_mongo_client
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MEMORY_ENTRIES", "2048"))
+DURABLE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_DURABLE_ENTRIES", "100000"))
+TTL_SECONDS = int(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", str(90 * 24 * 3600)))
+# "mongo" (default) adds the durable tier, "memory" keeps the cache in-process only.
+BACKEND = os.getenv("EXTRACTION_CACHE", "mongo")
+
+# Trim the durable tier back to its size limit after this many writes.
+TRIM_EVERY = 100
+
+
+def normalize_description(description: str) -> str:
+    """Collapse whitespace and Unicode variants that do not change the meaning."""
+    return " ".join(unicodedata.normalize("NFKC", description).split())
+
+
+def cache_key(description: str, model_id: str, prompt_version: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model_id, prompt_version, normalize_description(description)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size- and TTL-bounded in-memory cache."""
+
+    def __init__(self, max_entries: int = MEMORY_MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MongoCacheStore:
+    """
+    Durable cache tier. Expiry is handled by a TTL index; size is bounded by
+    periodically deleting the oldest entries beyond ``max_entries``.
+    """
+
+    INDEXES = [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ]
+
+    def __init__(
+        self, collection, max_entries: int = DURABLE_MAX_ENTRIES, ttl: float = TTL_SECONDS
+    ):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._indexed = False
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        doc = self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(UTC)}}, {"fields": 1}
+        )
+        return doc["fields"] if doc else None
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        if not self._indexed:
+            self.collection.create_indexes(self.INDEXES)
+            self._indexed = True
+
+        now = datetime.now(UTC)
+        self.collection.replace_one(
+            {"_id": key},
+            {"fields": value, "created_at": now, "expires_at": now + timedelta(seconds=self.ttl)},
+            upsert=True,
+        )
+        self._writes += 1
+        if self._writes % TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self) -> int:
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return 0
+        oldest = self.collection.find({}, {"_id": 1}).sort("created_at", ASCENDING).limit(excess)
+        result = self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in oldest]}})
+        return result.deleted_count
+
+
+class ExtractionCache:
+    """Two-tier cache: in-memory LRU in front of an optional durable store."""
+
+    def __init__(self, memory: LRUCache | None = None, durable: MongoCacheStore | None = None):
+        self.memory = memory or LRUCache()
+        self.durable = durable
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        value = self.memory.get(key)
+        if value is None and self.durable is not None:
+            try:
+                value = self.durable.get(key)
+            except Exception as exc:
+                logger.info("Extraction cache lookup failed: %s", exc)
+            if value is not None:
+                self.memory.put(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        self.memory.put(key, value)
+        if self.durable is not None:
+            try:
+                self.durable.put(key, value)
+            except Exception as exc:
+                logger.info("Extraction cache write failed: %s", exc)
+
+
+_cache: ExtractionCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Return the process-wide cache, attaching the Mongo tier when configured."""
+    global _cache
+    if _cache is not None:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None:
+            durable = None
+            if BACKEND == "mongo" and os.getenv("MONGO_CONNECTION_STRING"):
+                durable = MongoCacheStore(get_extraction_cache_collection(get_mongo_client()))
+            _cache = ExtractionCache(durable=durable)
+    return _cache
@@ -3,16 +3,291 @@
 from __future__ import annotations
 
 import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
 from typing import Any
 
-from shared.mongo import get_database, get_mongo_client
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
-from .checksum import json_checksum, string_checksum
-from .description_extractor import extract_description
+from shared.indexes import ensure_indexes_once
+from shared.metrics import incr, invocation, metrics, span
+from shared.mongo import get_database, get_mongo_client, get_pool_stats
+from shared.queue import load_message, resolve_html
+
+from .checksum import field_checksums, json_checksum_matches, string_checksum_matches
+from .description_extractor import extract_descriptions
+from .enrichment import DONE, is_due, pending_fields, retry_fields
 from .parse_listings import parse_listing_html
+from .record import ListingRecord
+
+# Worker threads used to decode and parse the records of one SQS batch
+PARSE_WORKERS = int(os.getenv("BUILDER_PARSE_WORKERS", "4"))
+# "inline" extracts descriptions before writing; "deferred" writes listings
+# immediately as pending and leaves extraction to builder.enrichment.
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "inline")
+
+logger = logging.getLogger(__name__)
+
+
+def get_postings():
+    """Return the postings collection, making sure its indexes exist on cold start."""
+    collection = get_database(get_mongo_client())
+    ensure_indexes_once(collection)
+    return collection
+
+
+# Checksums written before per-field hashes; removed when a document is migrated.
+LEGACY_CHECKSUMS = ("check_sum_json", "check_sum_description")
+
+STORED_STATE_PROJECTION = {
+    "listing_id": 1,
+    "field_hashes": 1,
+    "enrichment_status": 1,
+    "enrichment_attempts": 1,
+    "enrichment_retry_at": 1,
+    **dict.fromkeys(LEGACY_CHECKSUMS, 1),
+}
+
+
+def needs_extraction(
+    parsed_listing: dict[str, Any], existing_listing: dict[str, Any] | None
+) -> bool:
+    """Descriptions are only sent for extraction when they are new or changed."""
+    description_text = parsed_listing.get("description") or ""
+    if not description_text:
+        return False
+    if existing_listing is None:
+        return True
+
+    stored_hashes = existing_listing.get("field_hashes")
+    if stored_hashes is not None:
+        new_hash = field_checksums({"description": parsed_listing.get("description")})
+        return stored_hashes.get("description") != new_hash["description"]
+    return not string_checksum_matches(
+        existing_listing.get("check_sum_description"), description_text
+    )
+
+
+def build_listing_update(
+    listing_id: str,
+    parsed_listing: dict[str, Any],
+    existing_listing: dict[str, Any] | None,
+    extracted_fields: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Return the update document (``$set`` / ``$unset``) for ``parsed_listing``,
+    or an empty dict when nothing changed.
+
+    Each stored listing keeps a ``field_hashes`` map with one hash per parsed
+    and typed field (see ``ListingRecord``), so only the fields whose hash
+    differs are written, and fields that disappeared are unset.
+    ``extracted_fields`` are added when the description is new or changed:
+    the extraction results, or the pending marker in deferred enrichment mode.
+    Documents still carrying the older whole-listing checksums are migrated.
+    """
+    record = ListingRecord.from_listing(parsed_listing).to_document()
+    db_listing = {**parsed_listing, **record}
+    hashes = field_checksums(db_listing)
+
+    if existing_listing is None:
+        return {
+            "$set": {
+                "listing_id": listing_id,
+                **db_listing,
+                **(extracted_fields or {}),
+                "field_hashes": hashes,
+            }
+        }
+
+    stored_hashes = existing_listing.get("field_hashes")
+    if stored_hashes is None:
+        updates = dict(record)
+        # The legacy checksums still tell whether anything changed, so an
+        # unchanged listing only gets its typed fields and hash map.
+        if not json_checksum_matches(existing_listing.get("check_sum_json"), parsed_listing):
+            updates.update(db_listing)
+        if extracted_fields and needs_extraction(parsed_listing, existing_listing):
+            updates.update(extracted_fields)
+        updates["field_hashes"] = hashes
+        return {"$set": updates, "$unset": dict.fromkeys(LEGACY_CHECKSUMS, "")}
+
+    updates: dict[str, Any] = {}
+    for field, value in db_listing.items():
+        if stored_hashes.get(field) != hashes[field]:
+            updates[field] = value
+            updates[f"field_hashes.{field}"] = hashes[field]
+    if "description" in updates and extracted_fields:
+        updates.update(extracted_fields)
+
+    removed = {}
+    for field in stored_hashes.keys() - hashes.keys():
+        removed[field] = ""
+        removed[f"field_hashes.{field}"] = ""
+
+    update: dict[str, Any] = {}
+    if updates:
+        update["$set"] = updates
+    if removed:
+        update["$unset"] = removed
+    return update
+
+
+def upsert_listings(
+    collection,
+    listings: dict[str, dict[str, Any]],
+    enrichment_mode: str = ENRICHMENT_MODE,
+) -> dict[str, Exception]:
+    """
+    Write a batch of parsed listings keyed by ``listing_id``.
+
+    Stored field hashes for the whole batch are read with one ``$in`` query
+    and every insert and update is applied in one unordered ``bulk_write``.
+    In inline mode, listings left pending by an earlier failed extraction are
+    extracted again once their retry is due, even if their description is
+    unchanged. Returns the listings that could not be written, with their errors.
+    """
+    failures: dict[str, Exception] = {}
+    if not listings:
+        return failures
+
+    with span("db_read"):
+        existing = {
+            doc["listing_id"]: doc
+            for doc in collection.find(
+                {"listing_id": {"$in": list(listings)}}, STORED_STATE_PROJECTION
+            )
+        }
 
+    to_extract = [
+        listing_id
+        for listing_id, parsed_listing in listings.items()
+        if needs_extraction(parsed_listing, existing.get(listing_id))
+    ]
+    incr("descriptions_changed", len(to_extract))
+    retries: list[str] = []
+    if enrichment_mode == "deferred":
+        # Write now and leave extraction to the enrichment worker.
+        extracted = {listing_id: pending_fields() for listing_id in to_extract}
+    else:
+        now = datetime.now(UTC)
+        retries = [
+            listing_id
+            for listing_id, parsed_listing in listings.items()
+            if listing_id not in to_extract
+            and parsed_listing.get("description")
+            and is_due(existing.get(listing_id), now)
+        ]
+        incr("extraction_retries", len(retries))
+        # Run every extraction the batch needs concurrently, before any write.
+        with span("extract"):
+            ids = to_extract + retries
+            descriptions = [listings[listing_id]["description"] for listing_id in ids]
+            extracted = {}
+            for listing_id, fields in zip(ids, extract_descriptions(descriptions), strict=True):
+                if fields is not None:
+                    extracted[listing_id] = {**fields, "enrichment_status": DONE}
+                elif listing_id in retries:
+                    extracted[listing_id] = retry_fields(existing[listing_id], now)
+                else:
+                    # Retried on a later crawl (or by the enrichment worker).
+                    extracted[listing_id] = {**pending_fields(), **retry_fields({}, now)}
+
+    operations: list[UpdateOne] = []
+    operation_ids: list[str] = []
+    with span("checksum"):
+        for listing_id, parsed_listing in listings.items():
+            try:
+                update = build_listing_update(
+                    listing_id, parsed_listing, existing.get(listing_id), extracted.get(listing_id)
+                )
+            except Exception as exc:
+                failures[listing_id] = exc
+                continue
+            if listing_id in retries:
+                # The description is unchanged, so the update does not carry them.
+                update.setdefault("$set", {}).update(extracted[listing_id])
+            if update:
+                operations.append(UpdateOne({"listing_id": listing_id}, update, upsert=True))
+                operation_ids.append(listing_id)
+
+    incr("listings_unchanged", len(listings) - len(operations) - len(failures))
+    if not operations:
+        return failures
+
+    write_errors = []
+    try:
+        with span("db_write"):
+            collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        write_errors = exc.details.get("writeErrors", [])
+        for error in write_errors:
+            failures[operation_ids[error["index"]]] = Exception(error.get("errmsg"))
+    incr("listings_written", len(operations) - len(write_errors))
+
+    return failures
+
+
+def parse_record(record: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """Decode one SQS record and parse its listing HTML."""
+    message = load_message(record["body"])
+    listing_id = message.get("listing_id")
+    html_content = message.get("html_content")
+    if not listing_id or not isinstance(html_content, str):
+        raise ValueError("Message must contain a listing_id and string html_content.")
+
+    incr("html_bytes", len(html_content))
+    with span("parse_listing", sample=True):
+        parsed_listing = parse_listing_html(html_content)
+    parsed_listing.setdefault("listing_id", listing_id)
+    return listing_id, parsed_listing
+
+
+def handle_batch(records: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Process a batch of SQS records: parse them concurrently, write them with a
+    single client, and report only the failed messages back to SQS so the rest
+    of the batch is not retried.
+    """
+    failed_ids: list[str] = []
+    listings: dict[str, dict[str, Any]] = {}
+    message_ids: dict[str, list[str]] = {}
+
+    incr("messages", len(records))
+    with span("parse"), ThreadPoolExecutor(max_workers=PARSE_WORKERS) as executor:
+        futures = [(record, executor.submit(parse_record, record)) for record in records]
+        for record, future in futures:
+            try:
+                listing_id, parsed_listing = future.result()
+            except Exception as exc:
+                logger.warning("Error processing message %s: %s", record.get("messageId"), exc)
+                failed_ids.append(record["messageId"])
+                continue
+            # A later message for the same listing supersedes an earlier one.
+            listings[listing_id] = parsed_listing
+            message_ids.setdefault(listing_id, []).append(record["messageId"])
+
+    if listings:
+        failures = upsert_listings(get_postings(), listings)
 
+        for listing_id, exc in failures.items():
+            logger.warning("Error writing listing %s: %s", listing_id, exc)
+            failed_ids.extend(message_ids[listing_id])
+
+    incr("failed_messages", len(failed_ids))
+    metrics.set_property("mongo_pool", get_pool_stats())
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]}
+
+
+@invocation("builder")
 def handler(event: dict[str, Any], context: Any | None = None) -> dict[str, Any]:
+    if "Records" in event:
+        return handle_batch(event["Records"])
+
+    # Accept the queue's compact payload and S3 pointer formats as well.
+    event = resolve_html(dict(event))
     html_content = event.get("html_content")
     listing_id = event.get("listing_id")
 
@@ -28,8 +303,11 @@ def handler(event: dict[str, Any], context: Any | None = None) -> dict[str, Any]
             "body": json.dumps({"error": "html_content must be a string."}),
         }
 
+    incr("messages")
+    incr("html_bytes", len(html_content))
     try:
-        parsed_listing = parse_listing_html(html_content)
+        with span("parse"):
+            parsed_listing = parse_listing_html(html_content)
     except Exception as exc:  # pragma: no cover - defensive catch for robustness
         return {
             "statusCode": 500,
@@ -43,44 +321,13 @@ def handler(event: dict[str, Any], context: Any | None = None) -> dict[str, Any]
             "body": json.dumps(parsed_listing, ensure_ascii=False),
         }
 
-    client = get_mongo_client()
-    collection = get_database(client)
-    existing_listing = collection.find_one({"listing_id": listing_id})
-    has_existing_listing = existing_listing is not None
-    existing_listing = existing_listing or {}
-
-    db_listing = dict(parsed_listing)
-    description_text = parsed_listing.get("description") or ""
+    failures = upsert_listings(get_postings(), {listing_id: parsed_listing})
 
-    new_json_checksum = json_checksum(db_listing)
-    new_desc_checksum = string_checksum(description_text)
-
-    if not has_existing_listing:
-        extracted_fields = extract_description(description_text) if description_text else {}
-        if extracted_fields:
-            db_listing.update(extracted_fields)
-        document = {
-            "listing_id": listing_id,
-            **db_listing,
-            "check_sum_json": new_json_checksum,
-            "check_sum_description": new_desc_checksum,
+    if listing_id in failures:
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": f"Failed to write listing: {failures[listing_id]}"}),
         }
-        collection.insert_one(document)
-    else:
-        updates: dict[str, Any] = {}
-        if new_json_checksum != existing_listing.get("check_sum_json"):
-            updates["check_sum_json"] = new_json_checksum
-            updates.update(db_listing)
-
-        if new_desc_checksum != existing_listing.get("check_sum_description"):
-            extracted_fields = extract_description(description_text) if description_text else {}
-            if extracted_fields:
-                db_listing.update(extracted_fields)
-            updates["check_sum_description"] = new_desc_checksum
-            updates.update(db_listing)
-
-        if updates:
-            collection.update_one({"listing_id": listing_id}, {"$set": updates})
 
     return {
         "statusCode": 200,
@@ -1,11 +1,23 @@
 from __future__ import annotations
 
+import os
+from importlib.util import find_spec
 from typing import Any
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from .constants import FIELD_ALIASES
 
+# Tree builder used by BeautifulSoup: "lxml" (C, optional) or "html.parser".
+# Defaults to lxml when it is installed.
+PARSER_BACKEND = os.getenv(
+    "HTML_PARSER", "lxml" if find_spec("lxml") is not None else "html.parser"
+)
+
+# Only the headline and the details block are needed, so by default the tree is
+# restricted to <h1> and <dl> elements (and their subtrees) while parsing.
+LISTING_ONLY = SoupStrainer(["h1", "dl"])
+
 
 def text_or_none(node) -> str | None:
     """Return the trimmed text for ``node`` or ``None`` if the node is missing."""
@@ -15,10 +27,21 @@ def text_or_none(node) -> str | None:
     return node.get_text(" ", strip=True)
 
 
-def parse_listing_html(html: str) -> dict[str, Any]:
-    """Parse a single listing HTML document and return the extracted fields."""
+def parse_listing_html(
+    html: str | bytes, parser: str | None = None, full_document: bool = False
+) -> dict[str, Any]:
+    """
+    Parse a single listing HTML document and return the extracted fields.
+
+    ``parser`` overrides ``PARSER_BACKEND``. ``full_document`` builds the whole
+    tree instead of only the headline and details subtrees.
+    """
 
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(
+        html,
+        parser or PARSER_BACKEND,
+        parse_only=None if full_document else LISTING_ONLY,
+    )
 
     details_root = soup.select_one("dl.classified-details.housing")
     if details_root is None:
@@ -0,0 +1,93 @@
+"""
+Typed, normalised view of a parsed listing.
+
+The parser keeps the fields as they are displayed ("$2,500 + util.", "3",
+"1/May/2026", "Yes"). ``ListingRecord`` converts the ones that are filtered and
+sorted on into numbers, datetimes and booleans, which are stored next to the
+display strings so that Mongo can answer range queries from numeric indexes.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+# Bump when the typed fields or their converters change, so stored documents
+# are rewritten on their next crawl.
+RECORD_VERSION = 1
+
+DATE_FORMAT = "%d/%b/%Y"
+PRICE = re.compile(r"\$?\s*(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d{1,2}))?")
+INTEGER = re.compile(r"\d+")
+YES = {"yes", "y", "true"}
+NO = {"no", "n", "false"}
+
+
+def price_cents(text: str | None) -> int | None:
+    """
+    The first amount in a displayed price, in cents: "$2,500 + util. ($835 /rm.)"
+    is 250000 and "$634.13" is 63413.
+    """
+    if not text:
+        return None
+    match = PRICE.search(text)
+    if match is None:
+        return None
+    dollars, cents = match.groups()
+    return int(dollars.replace(",", "")) * 100 + int((cents or "0").ljust(2, "0"))
+
+
+def integer(text: str | None) -> int | None:
+    if not text:
+        return None
+    match = INTEGER.search(text)
+    return int(match.group()) if match else None
+
+
+def date(text: str | None) -> datetime | None:
+    """A displayed date such as "1/Jan/2026", as midnight UTC."""
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text.strip(), DATE_FORMAT).replace(tzinfo=UTC)
+    except ValueError:
+        return None
+
+
+def yes_no(text: str | None) -> bool | None:
+    if not text:
+        return None
+    value = text.strip().casefold()
+    if value in YES:
+        return True
+    if value in NO:
+        return False
+    return None
+
+
+@dataclass(slots=True, frozen=True)
+class ListingRecord:
+    """Typed fields stored alongside a listing's display strings."""
+
+    price_cents: int | None = None
+    beds_count: int | None = None
+    date_available_at: datetime | None = None
+    date_posted_at: datetime | None = None
+    is_shared: bool | None = None
+    is_sublet: bool | None = None
+
+    @classmethod
+    def from_listing(cls, listing: dict[str, Any]) -> ListingRecord:
+        return cls(
+            price_cents=price_cents(listing.get("price")),
+            beds_count=integer(listing.get("beds")),
+            date_available_at=date(listing.get("date_available")),
+            date_posted_at=date(listing.get("date_posted")),
+            is_shared=yes_no(listing.get("shared")),
+            is_sublet=yes_no(listing.get("sublet")),
+        )
+
+    def to_document(self) -> dict[str, Any]:
+        return {**asdict(self), "record_version": RECORD_VERSION}
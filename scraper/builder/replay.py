@@ -0,0 +1,165 @@
+"""
+Replay the snapshot archive through the parser and the upsert path.
+
+    python -m builder.replay ./archive
+    python -m builder.replay s3://bucket/archive --workers 8 --dry-run
+
+By default only the latest snapshot of each listing is replayed. Parsing runs
+in worker processes, one chunk of a segment at a time; writes go through
+``upsert_listings`` from the parent process in batches. Descriptions are
+marked pending for the enrichment worker instead of being sent to the model,
+so a replay needs no network beyond Mongo (and none at all with ``--dry-run``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby
+from typing import Any
+
+from shared.archive import Archive
+from shared.mongo import close_mongo_client
+
+from .main import get_postings, upsert_listings
+from .parse_listings import parse_listing_html
+
+ParseResult = tuple[str, dict[str, Any] | None, str | None]
+
+
+def plan_chunks(entries: list[dict[str, Any]], chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+    """
+    Split index entries, in order, into chunks that each read from a single
+    segment.
+    """
+    for _, group in groupby(entries, key=lambda entry: entry["segment"]):
+        group = list(group)
+        for start in range(0, len(group), chunk_size):
+            yield group[start : start + chunk_size]
+
+
+def parse_chunk(location: str, entries: list[dict[str, Any]]) -> list[ParseResult]:
+    """Worker: read and parse one chunk, returning ``(listing_id, parsed, error)``."""
+    results: list[ParseResult] = []
+    for entry, raw in Archive(location).read_many(entries):
+        listing_id = entry["listing_id"]
+        try:
+            parsed = parse_listing_html(raw.decode(entry["encoding"], errors="replace"))
+        except Exception as exc:
+            results.append((listing_id, None, str(exc)))
+            continue
+        parsed.setdefault("listing_id", listing_id)
+        results.append((listing_id, parsed, None))
+    return results
+
+
+def replay(
+    location: str,
+    workers: int | None = None,
+    chunk_size: int = 200,
+    batch_size: int = 100,
+    latest_only: bool = True,
+    dry_run: bool = False,
+    enrichment_mode: str = "deferred",
+) -> dict[str, Any]:
+    archive = Archive(location)
+    if latest_only:
+        # Order does not matter with one snapshot per listing: read segments in order.
+        entries = sorted(
+            archive.latest().values(), key=lambda entry: (entry["segment"], entry["offset"])
+        )
+    else:
+        entries = list(archive.entries())
+
+    collection = None if dry_run else get_postings()
+
+    counts = {"entries": len(entries), "parsed": 0, "parse_failed": 0, "write_failed": 0}
+    failures: list[tuple[str, str]] = []
+    pending: dict[str, dict[str, Any]] = {}
+
+    def write(batch: dict[str, dict[str, Any]]) -> None:
+        for listing_id, exc in upsert_listings(collection, batch, enrichment_mode).items():
+            counts["write_failed"] += 1
+            failures.append((listing_id, f"write: {exc}"))
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of chunks in flight, consumed in order.
+        window = 2 * workers
+        chunks = plan_chunks(entries, chunk_size)
+        in_flight: deque[Future[list[ParseResult]]] = deque()
+        while True:
+            while len(in_flight) < window and (chunk := next(chunks, None)) is not None:
+                in_flight.append(executor.submit(parse_chunk, location, chunk))
+            if not in_flight:
+                break
+            for listing_id, parsed, error in in_flight.popleft().result():
+                if parsed is None:
+                    counts["parse_failed"] += 1
+                    failures.append((listing_id, f"parse: {error}"))
+                    continue
+                counts["parsed"] += 1
+                if dry_run:
+                    continue
+                # Without latest_only, a later snapshot supersedes an earlier one.
+                if listing_id in pending:
+                    write(pending)
+                    pending = {}
+                pending[listing_id] = parsed
+                if len(pending) >= batch_size:
+                    write(pending)
+                    pending = {}
+    if pending:
+        write(pending)
+
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    counts["failures"] = failures
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay archived postings through the builder")
+    parser.add_argument("archive", help="Archive directory or s3://bucket/prefix")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Postings per work unit")
+    parser.add_argument("--batch-size", type=int, default=100, help="Listings per bulk write")
+    parser.add_argument(
+        "--all", action="store_true", help="Replay every snapshot in order, not just the latest"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Parse only, do not write")
+    parser.add_argument(
+        "--enrichment",
+        choices=["deferred", "inline"],
+        default="deferred",
+        help="Mark changed descriptions pending (default) or extract them now",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        counts = replay(
+            args.archive,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            latest_only=not args.all,
+            dry_run=args.dry_run,
+            enrichment_mode=args.enrichment,
+        )
+    finally:
+        close_mongo_client()
+    for listing_id, error in counts.pop("failures"):
+        print(f"[ERROR] {listing_id}: {error}")
+    print(
+        f"Replayed {counts['parsed']}/{counts['entries']} postings in {counts['seconds']}s "
+        f"({counts['parse_failed']} parse failures, {counts['write_failed']} write failures)"
+    )
+    return 1 if counts["parse_failed"] or counts["write_failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,186 @@
+"""Checks for batched description extraction against a fake ``converse`` client."""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any
+
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+from builder import description_extractor
+from builder.description_extractor import extract_descriptions, pre_extract
+from builder.test.basic_parsing import EXPECTED_LISTINGS
+
+
+class FakeConverseClient:
+    """
+    Answers ``converse`` calls like Bedrock would, echoing each description's
+    length so results can be matched to inputs. The first ``throttle`` calls
+    raise ThrottlingException, and the calls after them raise ``errors`` in turn.
+    """
+
+    def __init__(
+        self, throttle: int = 0, packed_ok: bool = True, errors: list[Exception] | None = None
+    ):
+        self.calls: list[list[str]] = []
+        self.throttle = throttle
+        self.errors = list(errors or [])
+        self.packed_ok = packed_ok
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def converse(self, modelId, messages, system, inferenceConfig) -> dict[str, Any]:  # noqa: ARG002
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            throttled = self.throttle > 0
+            self.throttle -= 1
+            error = self.errors.pop(0) if self.errors and not throttled else None
+        try:
+            if throttled:
+                raise ClientError(
+                    {"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "Converse"
+                )
+            if error is not None:
+                raise error
+
+            text = messages[0]["content"][0]["text"]
+            if "numbered descriptions" in system[0]["text"]:
+                texts = [part.split(". ", 1)[1] for part in text.split("\n\n")]
+                with self._lock:
+                    self.calls.append(texts)
+                payload: Any = [{"term_length": len(t)} for t in texts]
+                if not self.packed_ok:
+                    payload = payload[:-1]
+            else:
+                with self._lock:
+                    self.calls.append([text])
+                payload = {"term_length": len(text), "demographic": "null"}
+            return {"output": {"message": {"content": [{"text": json.dumps(payload)}]}}}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def descriptions(prefix: str, count: int, length: int = 40) -> list[str]:
+    return [f"{prefix} {i} ".ljust(length + i, "x") for i in range(count)]
+
+
+def test_packs_short_descriptions() -> None:
+    client = FakeConverseClient()
+    texts = descriptions("packed", 12)
+    results = extract_descriptions(texts, bedrock_client=client, max_workers=3, use_rules=False)
+
+    assert results == [{"term_length": len(t)} for t in texts]
+    assert sorted(len(call) for call in client.calls) == [2, 5, 5]
+    assert client.max_in_flight <= 3
+
+
+def test_duplicates_and_cache_skip_calls() -> None:
+    client = FakeConverseClient()
+    texts = descriptions("dup", 2)
+    extract_descriptions(texts, bedrock_client=client, use_rules=False)
+    results = extract_descriptions(texts + texts + [""], bedrock_client=client, use_rules=False)
+
+    assert len(client.calls) == 1
+    assert results[:4] == [{"term_length": len(t)} for t in texts + texts]
+    assert results[4] == {}
+
+
+def test_falls_back_when_packed_answer_is_malformed() -> None:
+    client = FakeConverseClient(packed_ok=False)
+    texts = descriptions("fallback", 3)
+    results = extract_descriptions(texts, bedrock_client=client, use_rules=False)
+
+    assert results == [{"term_length": len(t)} for t in texts]
+    assert [len(call) for call in client.calls] == [3, 1, 1, 1]
+
+
+def test_retries_throttling() -> None:
+    client = FakeConverseClient(throttle=2)
+    long_text = "long " + "y" * description_extractor.PACK_MAX_CHARS
+    results = extract_descriptions([long_text], bedrock_client=client, use_rules=False)
+
+    assert results == [{"term_length": len(long_text)}]
+    assert len(client.calls) == 1
+
+
+def test_retries_timeouts() -> None:
+    client = FakeConverseClient(errors=[ReadTimeoutError(endpoint_url="https://bedrock")])
+    long_text = "timeout " + "t" * description_extractor.PACK_MAX_CHARS
+    results = extract_descriptions([long_text], bedrock_client=client, use_rules=False)
+
+    assert results == [{"term_length": len(long_text)}]
+    assert client.errors == []
+
+
+def test_failed_calls_return_none() -> None:
+    client = FakeConverseClient(throttle=description_extractor.MAX_ATTEMPTS)
+    long_text = "failed " + "z" * description_extractor.PACK_MAX_CHARS
+    results = extract_descriptions([long_text, ""], bedrock_client=client, use_rules=False)
+
+    # The failed description is not cached or filled with partial fields.
+    assert results == [None, {}]
+    assert extract_descriptions([long_text], bedrock_client=client, use_rules=False) == [
+        {"term_length": len(long_text)}
+    ]
+
+
+def test_rules_resolve_fixture_descriptions() -> None:
+    client = FakeConverseClient()
+    texts = {
+        listing_id: listing["description"] for listing_id, listing in EXPECTED_LISTINGS.items()
+    }
+    results = dict(
+        zip(texts, extract_descriptions(list(texts.values()), bedrock_client=client), strict=True)
+    )
+
+    assert results["101772"] == {
+        "demographic": "woman",
+        "term_length": 8,
+        "term_length_type": "winter",
+        "furnished": True,
+    }
+    assert results["101927"] == {"demographic": "man"}
+    assert results["101947"] == {}
+    assert results["101953"] == {"furnished": True}
+    # Only the listing with an ambiguous term reaches the model, and only that
+    # field is taken from its answer.
+    assert client.calls == [[texts["101975"]]]
+    assert results["101975"] == {}
+
+
+def test_rule_confidence() -> None:
+    assert pre_extract("Unfurnished room, 4 month summer sublet")["furnished"] == (False, 0.95)
+    assert pre_extract("4 month summer sublet")["term_length"] == (4, 0.85)
+    assert pre_extract("4 month summer sublet")["term_length_type"] == ("summer", 0.85)
+    assert pre_extract("Co-ed house, 3 girls and 2 guys")["demographic"] == ("mixed", 0.9)
+    assert pre_extract("May to August, 3 months")["term_length"] == (None, 0.4)
+    assert pre_extract("Room for the fall semester")["term_length"] == (None, 0.5)
+
+
+def main() -> int:
+    # No real backoff in tests
+    description_extractor.BASE_DELAY = 0
+
+    for test in (
+        test_packs_short_descriptions,
+        test_duplicates_and_cache_skip_calls,
+        test_falls_back_when_packed_answer_is_malformed,
+        test_retries_throttling,
+        test_retries_timeouts,
+        test_failed_calls_return_none,
+        test_rules_resolve_fixture_descriptions,
+        test_rule_confidence,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All extraction checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
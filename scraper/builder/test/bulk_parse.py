@@ -0,0 +1,75 @@
+"""Checks for the multiprocess bulk-parse command."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from builder import bulk_parse
+from builder.test.basic_parsing import EXPECTED_LISTINGS, FIXTURES_DIR
+
+
+def write_pages(root: Path) -> list[str]:
+    """Copy the fixtures into ``root`` next to one page that does not parse."""
+    for path in FIXTURES_DIR.glob("*.txt"):
+        shutil.copy(path, root / f"{path.stem}.html")
+    (root / "broken.html").write_text("<html><body>Not a listing</body></html>")
+    return sorted(path.stem for path in FIXTURES_DIR.glob("*.txt"))
+
+
+def test_parquet_schema_and_failures() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        listing_ids = write_pages(root)
+        output, failures = root / "listings.parquet", root / "failed.ndjson"
+
+        code = bulk_parse.main(
+            [str(root), "-o", str(output), "--failures", str(failures), "--workers", "2"]
+        )
+
+        assert code == 1
+        (failure,) = [json.loads(line) for line in failures.read_text().splitlines()]
+        assert failure["path"].endswith("broken.html")
+        assert "ValueError" in failure["error"]
+
+        table = pq.read_table(output)
+        assert table.schema == bulk_parse.parquet_schema(pa)
+        rows = {row["listing_id"]: row for row in table.to_pylist()}
+        assert sorted(rows) == listing_ids
+        assert rows["101947"]["price"] == EXPECTED_LISTINGS["101947"]["price"]
+        assert rows["101947"]["price_cents"] == 250000
+        assert rows["101947"]["date_available_at"].year == 2026
+
+
+def test_ndjson_output() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        listing_ids = write_pages(root)
+        (root / "broken.html").unlink()
+        output = root / "listings.ndjson"
+
+        assert bulk_parse.main([str(root), "--pattern", "*.html", "-o", str(output)]) == 0
+        listings = [json.loads(line) for line in output.read_text().splitlines()]
+        # Written in input order.
+        assert [listing["listing_id"] for listing in listings] == listing_ids
+
+
+def main() -> int:
+    for test in (
+        test_parquet_schema_and_failures,
+        test_ndjson_output,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All bulk parse checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
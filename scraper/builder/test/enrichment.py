@@ -0,0 +1,142 @@
+"""Checks for the deferred enrichment worker against mongomock."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Any
+
+import mongomock
+
+from builder import enrichment
+from builder import main as builder_main
+from builder.checksum import field_checksums
+
+
+def pending_collection(descriptions: list[str]):
+    collection = mongomock.MongoClient()["housing"]["postings"]
+    collection.insert_many(
+        {
+            "listing_id": str(i),
+            "description": description,
+            "field_hashes": field_checksums({"description": description}),
+            **enrichment.pending_fields(),
+        }
+        for i, description in enumerate(descriptions)
+    )
+    return collection
+
+
+@contextmanager
+def patched(**attributes: Any) -> Iterator[None]:
+    """Replace ``builder.enrichment`` attributes for the duration of a test."""
+    previous = {name: getattr(enrichment, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(enrichment, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(enrichment, name, value)
+
+
+def fail_some(texts: list[str]) -> list[dict | None]:
+    return [None if text == "fails" else {"furnished": True} for text in texts]
+
+
+def test_failed_extractions_stay_pending() -> None:
+    collection = pending_collection(["ok", "fails"])
+    with patched(extract_descriptions=fail_some):
+        assert enrichment.enrich_pending(collection) == {"pending": 2, "enriched": 1, "failed": 1}
+        done = collection.find_one({"description": "ok"})
+        assert done["enrichment_status"] == enrichment.DONE
+        assert done["furnished"] is True
+
+        failed = collection.find_one({"description": "fails"})
+        assert failed["enrichment_status"] == enrichment.PENDING
+        assert failed["enrichment_attempts"] == 1
+        retry_at = failed["enrichment_retry_at"].replace(tzinfo=UTC)
+        assert retry_at > datetime.now(UTC)
+
+        # Not picked up again until its retry is due.
+        assert enrichment.enrich_pending(collection)["pending"] == 0
+        collection.update_one(
+            {"_id": failed["_id"]}, {"$set": {"enrichment_retry_at": datetime(2000, 1, 1)}}
+        )
+        assert enrichment.enrich_pending(collection) == {"pending": 1, "enriched": 0, "failed": 1}
+        assert collection.find_one({"_id": failed["_id"]})["enrichment_attempts"] == 2
+
+
+def test_handler_stops_when_nothing_succeeds() -> None:
+    collection = pending_collection([f"description {i}" for i in range(10)])
+    with patched(
+        extract_descriptions=lambda texts: [None for _ in texts],
+        get_database=lambda client: collection,  # noqa: ARG005
+        get_mongo_client=lambda: None,
+    ):
+        response = enrichment.handler({"max_batches": 5, "batch_size": 2})
+
+    assert response["statusCode"] == 200
+    assert '"batches": 1' in response["body"]
+    assert collection.count_documents({"enrichment_status": enrichment.PENDING}) == 10
+
+
+def test_inline_failures_are_retried_on_recrawl() -> None:
+    collection = mongomock.MongoClient()["housing"]["postings"]
+    listing = {"description": "Furnished room", "price": "$900"}
+    calls: list[str] = []
+
+    def extract(texts: list[str], fail: bool) -> list[dict | None]:
+        calls.extend(texts)
+        return [None if fail else {"furnished": True} for _ in texts]
+
+    original = builder_main.extract_descriptions
+    try:
+        builder_main.extract_descriptions = lambda texts: extract(texts, fail=True)
+        assert builder_main.upsert_listings(collection, {"1": dict(listing)}, "inline") == {}
+        stored = collection.find_one({"listing_id": "1"})
+        assert stored["enrichment_status"] == enrichment.PENDING
+        assert stored["enrichment_attempts"] == 1
+
+        # Same description, retry not yet due: nothing is sent.
+        builder_main.upsert_listings(collection, {"1": dict(listing)}, "inline")
+        assert len(calls) == 1
+
+        # Due and failing again: the attempt count and backoff grow.
+        collection.update_one({}, {"$set": {"enrichment_retry_at": datetime(2000, 1, 1)}})
+        builder_main.upsert_listings(collection, {"1": dict(listing)}, "inline")
+        stored = collection.find_one({"listing_id": "1"})
+        assert len(calls) == 2
+        assert stored["enrichment_attempts"] == 2
+        assert stored["enrichment_retry_at"].replace(tzinfo=UTC) > datetime.now(UTC)
+
+        # Due and succeeding: the fields are written and the listing is done.
+        collection.update_one({}, {"$set": {"enrichment_retry_at": datetime(2000, 1, 1)}})
+        builder_main.extract_descriptions = lambda texts: extract(texts, fail=False)
+        builder_main.upsert_listings(collection, {"1": dict(listing)}, "inline")
+        stored = collection.find_one({"listing_id": "1"})
+        assert stored["enrichment_status"] == enrichment.DONE
+        assert stored["furnished"] is True
+
+        builder_main.upsert_listings(collection, {"1": dict(listing)}, "inline")
+        assert len(calls) == 3
+    finally:
+        builder_main.extract_descriptions = original
+
+
+def main() -> int:
+    for test in (
+        test_failed_extractions_stay_pending,
+        test_handler_stops_when_nothing_succeeds,
+        test_inline_failures_are_retried_on_recrawl,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All enrichment checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
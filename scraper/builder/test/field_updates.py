@@ -0,0 +1,68 @@
+"""Checks for field-level change detection in the builder's upsert path."""
+
+from __future__ import annotations
+
+from builder.main import build_listing_update, needs_extraction
+from builder.test.basic_parsing import EXPECTED_LISTINGS
+
+LISTING_ID = "101947"
+
+
+def stored(listing: dict) -> dict:
+    """The state ``upsert_listings`` reads back for a listing written earlier."""
+    document = build_listing_update(LISTING_ID, listing, None)["$set"]
+    return {"listing_id": LISTING_ID, "field_hashes": document["field_hashes"]}
+
+
+def test_unchanged_listing_writes_nothing() -> None:
+    listing = EXPECTED_LISTINGS[LISTING_ID]
+    assert build_listing_update(LISTING_ID, listing, stored(listing)) == {}
+    assert not needs_extraction(listing, stored(listing))
+
+
+def test_price_change_sets_only_price_fields() -> None:
+    listing = EXPECTED_LISTINGS[LISTING_ID]
+    changed = {**listing, "price": "$2,600 + util."}
+    update = build_listing_update(LISTING_ID, changed, stored(listing), {"furnished": True})
+    assert set(update) == {"$set"}
+    assert set(update["$set"]) == {
+        "price",
+        "price_cents",
+        "field_hashes.price",
+        "field_hashes.price_cents",
+    }
+    assert update["$set"]["price_cents"] == 260000
+    assert not needs_extraction(changed, stored(listing))
+
+
+def test_description_change_adds_extracted_fields() -> None:
+    listing = EXPECTED_LISTINGS[LISTING_ID]
+    changed = {**listing, "description": listing["description"] + " Pets welcome."}
+    assert needs_extraction(changed, stored(listing))
+    update = build_listing_update(LISTING_ID, changed, stored(listing), {"pets_allowed": True})
+    assert set(update["$set"]) == {"description", "field_hashes.description", "pets_allowed"}
+
+
+def test_removed_field_is_unset() -> None:
+    listing = EXPECTED_LISTINGS[LISTING_ID]
+    changed = {field: value for field, value in listing.items() if field != "category"}
+    update = build_listing_update(LISTING_ID, changed, stored(listing))
+    assert update == {"$unset": {"category": "", "field_hashes.category": ""}}
+
+
+def main() -> int:
+    for test in (
+        test_unchanged_listing_writes_nothing,
+        test_price_change_sets_only_price_fields,
+        test_description_change_adds_extracted_fields,
+        test_removed_field_is_unset,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All field update checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""Checks for replaying the snapshot archive through the builder."""
+
+from __future__ import annotations
+
+import tempfile
+
+import mongomock
+
+from builder import replay
+from builder.test.basic_parsing import FIXTURES_DIR
+from shared import mongo
+from shared.archive import Archive
+
+FIXTURES = {path.stem: path.read_bytes() for path in sorted(FIXTURES_DIR.glob("*.txt"))}
+FIRST, SECOND, THIRD = sorted(FIXTURES)[:3]
+
+
+def write_archive(root: str) -> None:
+    """Three segments: listing "a" archived twice, then "b" and a page that does not parse."""
+    with Archive(root) as archive:
+        archive.add("a", "https://example.com/a/", FIXTURES[FIRST])
+    with Archive(root) as archive:
+        archive.add("a", "https://example.com/a/", FIXTURES[SECOND])
+        archive.add("b", "https://example.com/b/", FIXTURES[THIRD])
+    with Archive(root) as archive:
+        archive.add("broken", "https://example.com/broken/", b"<html><body></body></html>")
+
+
+def run(root: str, *args: str) -> tuple[int, list[dict], mongomock.Collection]:
+    """Run the CLI against a fresh mongomock client, recording every write batch."""
+    batches: list[dict] = []
+    original = mongo._client, replay.upsert_listings
+
+    def upsert(collection, listings, enrichment_mode):
+        batches.append(dict(listings))
+        return original[1](collection, listings, enrichment_mode)
+
+    client = mongo._client = mongomock.MongoClient()
+    replay.upsert_listings = upsert
+    try:
+        code = replay.main([root, "--workers", "1", *args])
+        # The CLI closes the shared client on exit.
+        assert mongo._client is None
+        return code, batches, mongo.get_database(client)
+    finally:
+        mongo._client, replay.upsert_listings = original
+
+
+def test_latest_snapshots_are_replayed() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        write_archive(root)
+        code, batches, postings = run(root)
+
+    # The unparsable page is reported through the exit code.
+    assert code == 1
+    assert [sorted(batch) for batch in batches] == [["a", "b"]]
+    stored = postings.find_one({"listing_id": "a"})
+    assert stored["headline"] == batches[0]["a"]["headline"]
+    assert stored["enrichment_status"] == "pending"
+    assert postings.count_documents({}) == 2
+
+
+def test_all_snapshots_in_order() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        write_archive(root)
+        code, batches, postings = run(root, "--all", "--batch-size", "10")
+        latest_only = run(root)[2].find_one({"listing_id": "a"})
+
+    assert code == 1
+    # The second snapshot of "a" starts a new batch, so it supersedes the first.
+    assert [list(batch) for batch in batches] == [["a"], ["a", "b"]]
+    assert postings.find_one({"listing_id": "a"})["headline"] == latest_only["headline"]
+
+
+def test_batches_and_dry_run() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        with Archive(root) as archive:
+            for i, html in enumerate(FIXTURES.values()):
+                archive.add(str(i), f"https://example.com/{i}/", html)
+        code, batches, postings = run(root, "--batch-size", "4", "--chunk-size", "2")
+        assert code == 0
+        assert [len(batch) for batch in batches] == [4, len(FIXTURES) - 4]
+        assert postings.count_documents({}) == len(FIXTURES)
+
+        code, batches, postings = run(root, "--dry-run")
+        assert code == 0
+        assert batches == []
+        assert postings.count_documents({}) == 0
+
+
+def main() -> int:
+    for test in (
+        test_latest_snapshots_are_replayed,
+        test_all_snapshots_in_order,
+        test_batches_and_dry_run,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All replay checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""Checks for the typed listing record and how it is stored."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from builder.checksum import ALGORITHMS, checksum_matches, fnv1a_32, stable_stringify
+from builder.main import build_listing_update, needs_extraction
+from builder.record import RECORD_VERSION, ListingRecord, price_cents
+from builder.test.basic_parsing import EXPECTED_LISTINGS
+
+
+def test_price_cents() -> None:
+    cases = {
+        "$634.13": 63413,
+        "$1100": 110000,
+        "$2,500 + util. ($835 /rm.)": 250000,
+        "$2,400 incl. ($800 rm.)": 240000,
+        "$1200 pp/inc": 120000,
+        "$950.5": 95050,
+        "Contact for price": None,
+        None: None,
+    }
+    for text, expected in cases.items():
+        assert price_cents(text) == expected, (text, price_cents(text))
+
+
+def test_fixture_records() -> None:
+    record = ListingRecord.from_listing(EXPECTED_LISTINGS["101947"])
+    assert record == ListingRecord(
+        price_cents=250000,
+        beds_count=3,
+        date_available_at=datetime(2026, 5, 1, tzinfo=UTC),
+        date_posted_at=datetime(2025, 11, 8, tzinfo=UTC),
+        is_shared=False,
+        is_sublet=False,
+    )
+    for listing in EXPECTED_LISTINGS.values():
+        record = ListingRecord.from_listing(listing)
+        assert None not in (record.price_cents, record.beds_count, record.date_available_at)
+
+
+def test_stored_alongside_display_fields() -> None:
+    listing = EXPECTED_LISTINGS["101772"]
+    document = build_listing_update("101772", listing, None)["$set"]
+    assert document["price"] == "$634.13"
+    assert document["price_cents"] == 63413
+    assert document["is_shared"] is True
+    assert document["record_version"] == RECORD_VERSION
+
+    # An unchanged listing stored before the typed fields existed is backfilled.
+    blake2b = ALGORITHMS["blake2b-128"]
+    legacy = {
+        "check_sum_json": f"blake2b-128:{blake2b(stable_stringify(listing))}",
+        "check_sum_description": f"blake2b-128:{blake2b(listing['description'])}",
+    }
+    update = build_listing_update("101772", listing, legacy)
+    assert set(update["$set"]) == set(ListingRecord.__slots__) | {"record_version", "field_hashes"}
+    assert set(update["$unset"]) == set(legacy)
+
+
+def test_fnv1a_checksums_are_migrated() -> None:
+    listing = EXPECTED_LISTINGS["101772"]
+    legacy = {
+        "check_sum_json": fnv1a_32(stable_stringify(listing)),
+        "check_sum_description": fnv1a_32(listing["description"]),
+    }
+    assert checksum_matches(legacy["check_sum_json"], stable_stringify(listing))
+    assert checksum_matches(legacy["check_sum_description"], listing["description"])
+    assert not checksum_matches(legacy["check_sum_description"], listing["description"] + ".")
+
+    # Unchanged: only the typed fields and hash map are added, and the
+    # description is not extracted again.
+    assert not needs_extraction(listing, legacy)
+    update = build_listing_update("101772", listing, legacy, {"furnished": True})
+    assert set(update["$set"]) == set(ListingRecord.__slots__) | {"record_version", "field_hashes"}
+    assert set(update["$unset"]) == set(legacy)
+
+    # A changed description under an old checksum is extracted again.
+    changed = {**listing, "description": listing["description"] + " Parking included."}
+    assert needs_extraction(changed, legacy)
+    update = build_listing_update("101772", changed, legacy, {"furnished": True})
+    assert update["$set"]["furnished"] is True
+    assert update["$set"]["description"] == changed["description"]
+
+
+def main() -> int:
+    for test in (
+        test_price_cents,
+        test_fixture_records,
+        test_stored_alongside_display_fields,
+        test_fnv1a_checksums_are_migrated,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All typed record checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
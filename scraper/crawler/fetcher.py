@@ -0,0 +1,131 @@
+"""Concurrent HTTP fetching for the crawler."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from shared.metrics import incr, span
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+# Maximum requests per second sent to a single host (0 disables the limit).
+DEFAULT_RATE_LIMIT = float(os.getenv("CRAWL_RATE_LIMIT", "10"))
+DEFAULT_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "15"))
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to each host so that no host sees more than
+    ``rate`` requests per second, regardless of how many threads are fetching.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> None:
+        if not self.interval:
+            return
+
+        # Reserve the next free slot under the lock, then sleep outside of it
+        # so other hosts (and later slots for this host) are not blocked.
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Fetcher:
+    """
+    Bounded thread pool around a single keep-alive ``requests.Session``.
+
+    ``get`` fetches synchronously on the calling thread, ``submit`` schedules
+    work on the pool. Both share the same connection pool and rate limiter.
+    """
+
+    def __init__(
+        self,
+        headers: dict[str, str] | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(rate_limit)
+
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        # One extra connection for the page walker running on the caller's thread.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.concurrency + 1,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="crawler-fetch"
+        )
+
+    def get(self, url: str, **kwargs) -> requests.Response | None:
+        """
+        Fetch ``url`` and return the response, or ``None`` if the request failed
+        at the transport level.
+        """
+        self.rate_limiter.acquire(urlsplit(url).netloc)
+        try:
+            with span("fetch"):
+                response = self.session.get(url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as exc:
+            logger.warning("Request to %s failed: %s", url, exc)
+            incr("request_errors")
+            return None
+        incr("requests")
+        incr("fetched_bytes", len(response.content))
+        return response
+
+    def submit(self, fn: Callable[..., T], /, *args, **kwargs) -> Future[T]:
+        """
+        Schedule ``fn(*args, **kwargs)`` on the fetch pool. ``fn`` is expected to
+        call ``get`` so that parsing happens alongside the download.
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
+
+    def __enter__(self) -> Fetcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
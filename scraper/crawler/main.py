@@ -1,7 +1,23 @@
-import requests
+import logging
+import os
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from datetime import timedelta
+
 from bs4 import BeautifulSoup as bs4
+from bs4.dammit import EncodingDetector
+
+from shared.archive import Archive
+from shared.metrics import incr, invocation, metrics, span
+from shared.mongo import get_crawl_state, get_database, get_mongo_client
+from shared.payload import trim_listing
 
-from shared.mongo import delete_id, get_database, get_mongo_client
+from .fetcher import DEFAULT_CONCURRENCY, DEFAULT_RATE_LIMIT, Fetcher
+from .state import CrawlStateStore, Posting, content_hash
+from .sync import IncompleteCrawl, SyncRun
+
+logger = logging.getLogger(__name__)
 
 # Constants
 API_URL = "https://thecannon.ca"
@@ -9,90 +25,357 @@ HEADERS = {
     "Content-Type": "text/html",
     "Accept": "text/html",
 }
+# Skip postings that are unchanged since the last crawl (see crawler/state.py)
+INCREMENTAL = os.getenv("CRAWL_INCREMENTAL", "0") == "1"
+# Incremental crawls stop paging after this many consecutive index pages of
+# known, unchanged postings. The index is newest first, so anything older has
+# not changed either.
+STOP_AFTER_PAGES = int(os.getenv("CRAWL_STOP_AFTER_PAGES", "1"))
+# Walk the whole index (and sync deletions) at least this often.
+FULL_SWEEP_INTERVAL = timedelta(hours=float(os.getenv("CRAWL_FULL_SWEEP_HOURS", "24")))
+# Directory or s3://bucket/prefix to archive fetched postings to (see shared/archive.py)
+ARCHIVE_LOCATION = os.getenv("CRAWL_ARCHIVE")
 
 
-def get_mongo_db_ids() -> dict[str, str]:
+def response_encoding(response) -> str:
     """
-    Fetch all listing IDs from the MongoDB database.
-    Returns a dictionary mapping listing IDs to their MongoDB `_id`.
+    The encoding of a posting's body: the charset from the Content-Type header,
+    else the one declared in the document, else what requests assumes.
     """
-    client = get_mongo_client()
-    collection = get_database(client)
-    try:
-        # Get all entries and extract the field `_id`
-        cur = collection.find({}, {"_id": 1, "listing_id": 1})
-        ids = {}
-
-        for doc in cur:
-            _id = doc.get("_id")
-            listing_id = doc.get("listing_id")
-            if _id is not None and listing_id is not None:
-                ids[listing_id] = _id
-        return ids
-    finally:
-        client.close()
+    if "charset" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        return response.encoding
+    declared = EncodingDetector.find_declared_encoding(response.content, is_html=True)
+    return declared or response.encoding or "utf-8"
+
+
+def fetch_posting(fetcher: Fetcher, url: str, previous: dict | None = None) -> Posting | None:
+    """
+    Fetch a single posting and return it with its raw HTML trimmed to the
+    listing, or ``None`` on failure.
+
+    When ``previous`` crawl state is given the request is conditional, and a
+    posting whose body is unchanged comes back with ``html`` set to ``None``.
+    """
+    headers = {}
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    with span("fetch_posting", sample=True):
+        posting_response = fetcher.get(url, headers=headers)
+    if posting_response is None or (
+        not posting_response.ok and posting_response.status_code != 304
+    ):
+        logger.warning("Unable to fetch the posting at %s", url)
+        incr("posting_errors")
+        return None
+
+    if posting_response.status_code == 304:
+        incr("postings_not_modified")
+        return Posting(url, None)
+
+    posting = Posting(
+        url,
+        None,
+        etag=posting_response.headers.get("ETag"),
+        last_modified=posting_response.headers.get("Last-Modified"),
+        content_hash=content_hash(posting_response.content),
+    )
+    if previous and previous.get("content_hash") == posting.content_hash:
+        incr("postings_unchanged")
+        return posting
+
+    with span("trim"):
+        posting.encoding = response_encoding(posting_response)
+        posting.html = trim_listing(posting_response.content, posting.encoding)
+    posting.raw = posting_response.content
+    incr("posting_bytes", len(posting.html))
+    return posting
 
 
-def get_housing_info() -> dict[str, str]:
+def index_entry(link) -> str:
+    """
+    Return the markup of the index-page card containing ``link``. Its hash
+    changes whenever anything shown for the listing on the index page changes.
+    """
+    card = link.find_parent(["article", "li", "tr"]) or link.parent or link
+    return str(card)
+
+
+def iter_index_pages(fetcher: Fetcher) -> Iterator[list[tuple[str, str]]]:
+    """
+    Walk the housing index pages in order and yield, per page, the
+    ``(url, index_hash)`` of each posting not seen on an earlier page.
+    Raises ``IncompleteCrawl`` when a page cannot be fetched (a 404 marks
+    the end of the index).
+    """
     page = 1
-    housing_links = {}
+    seen: set[str] = set()
 
     while True:
-        print(f"Fetching page: {page}")
-        response = requests.get(f"{API_URL}/housing/page/{page}", headers=HEADERS)
-        if not response.ok:
-            print(f"Error: Unable to fetch the housing page on page {page}")
-            return housing_links
+        logger.debug("Fetching page: %s", page)
+        response = fetcher.get(f"{API_URL}/housing/page/{page}")
+        if response is not None and response.status_code == 404:
+            # Past the last page.
+            return
+        if response is None or not response.ok:
+            incr("index_errors")
+            raise IncompleteCrawl(f"Unable to fetch the housing page on page {page}")
+        incr("index_pages")
 
-        html = bs4(response.text, "html.parser")
-        links = html.select(f'a[href^="{API_URL}/classified/housing"]')
+        with span("parse_index"):
+            html = bs4(response.text, "html.parser")
+            links = html.select(f'a[href^="{API_URL}/classified/housing"]')
 
         # If no housing links are found, break the loop!
         if not links:
-            break
+            return
 
+        entries = []
         for link in links:
-            print(f"Found housing link: {link['href']}")
-            posting_response = requests.get(link["href"], headers=HEADERS)
-            if not posting_response.ok:
-                print(f"Error: Unable to fetch the posting at {link['href']}")
+            href = link["href"]
+            if href in seen:
                 continue
+            seen.add(href)
+            entries.append((href, content_hash(index_entry(link))))
 
-            posting_html = bs4(posting_response.text, "html.parser").prettify()
-            housing_links[link["href"]] = posting_html
-
-        requests.get(f"{API_URL}/classified/housing/page/{page}")
+        incr("listings_found", len(entries))
+        yield entries
         page += 1
 
-    return housing_links
 
+def iter_housing_postings(
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    max_in_flight: int | None = None,
+    state: CrawlStateStore | None = None,
+    stop_after: int | None = None,
+) -> Iterator[Posting]:
+    """
+    Stream every posting on the site.
 
-def main():
-    housing_info = get_housing_info()
-    if not housing_info:
-        print("No housing information found")
-        return
+    Index pages are discovered lazily while postings download on a bounded
+    pool. At most ``max_in_flight`` postings are fetched ahead of the consumer,
+    so memory stays bounded by the window rather than by the size of the site.
+
+    With a ``state`` store the crawl is incremental: postings whose index entry
+    is unchanged are not fetched at all, the rest are fetched conditionally,
+    and unchanged postings are yielded with ``html`` set to ``None``. The
+    state of unchanged postings is recorded once the consumer has moved past
+    them; changed postings are left for the consumer to record once it has
+    delivered them, so a failed delivery is fetched again on the next crawl.
+
+    With ``stop_after`` as well, paging stops once that many consecutive index
+    pages hold only known, unchanged postings. "Known and unchanged" is
+    judged by the crawl state's hash of each index card rather than by the
+    stored ``date_posted``: the posting date is only on the detail page, so
+    comparing it would mean fetching every posting, and an edited posting
+    keeps its original date.
+    """
+    window = max_in_flight or 2 * concurrency
+    in_flight: deque[tuple[str, Future[Posting | None]]] = deque()
+    unchanged_pages = 0
+
+    def drain(keep: int) -> Iterator[Posting]:
+        while len(in_flight) > keep:
+            index_hash, future = in_flight.popleft()
+            posting = future.result()
+            if posting is None:
+                continue
+            posting.index_hash = index_hash
+            yield posting
+            if state is not None and not posting.changed:
+                state.record(posting)
 
-    existing_ids = get_mongo_db_ids()
-    print(f"Existing IDs in database: {existing_ids}")
+    with Fetcher(HEADERS, concurrency=concurrency, rate_limit=rate_limit) as fetcher:
+        try:
+            for entries in iter_index_pages(fetcher):
+                previous = state.lookup([url for url, _ in entries]) if state else {}
+                unchanged = 0
+                for url, index_hash in entries:
+                    prev = previous.get(url)
+                    if prev and prev.get("index_hash") == index_hash:
+                        unchanged += 1
+                        incr("postings_skipped")
+                        # Unchanged on the index page: skip the detail fetch entirely.
+                        future: Future[Posting | None] = Future()
+                        future.set_result(Posting(url, None))
+                    else:
+                        future = fetcher.submit(fetch_posting, fetcher, url, prev)
+                    in_flight.append((index_hash, future))
+                    yield from drain(window - 1)
 
-    for url, _ in housing_info.items():
-        listing_id = url.rstrip(" /").split("/")[-1]
-        if listing_id in existing_ids:
-            # Listing exists, remove it from existing_ids to avoid deletion
-            del existing_ids[listing_id]
+                if entries and unchanged == len(entries):
+                    unchanged_pages += 1
+                else:
+                    unchanged_pages = 0
+                if stop_after and unchanged_pages >= stop_after:
+                    logger.info("Stopping after %s unchanged index pages", unchanged_pages)
+                    break
+        except IncompleteCrawl:
+            # Hand over the postings already fetched before giving up.
+            yield from drain(0)
+            raise
+        else:
+            yield from drain(0)
+        finally:
+            if state is not None:
+                state.flush()
 
-    # The leftover IDs should be deleted from the database (delete)
-    print(f"Deleting listings with IDs: {existing_ids.values()}")
-    deleted_count = delete_id(list(existing_ids.values()))
-    print(f"Deleted {deleted_count} listings from the database")
 
-    # Process ALL listings (create, update, etc.)
-    for url, _ in housing_info.items():
-        listing_id = url.rstrip(" /").split("/")[-1]
-        print(f"Processing listing with ID: {listing_id}")
-        # TODO: Send this data to a queue
+Sink = Callable[[str, bytes, str], bool | Future[bool] | None]
+
+
+def send_to_builder(listing_id: str, html: bytes, encoding: str = "utf-8") -> bool:
+    """
+    Default sink: parse and upsert the posting in-process with the builder.
+    Returns whether the listing was written.
+    """
+    # Imported here so that the queue producer, which never calls the builder
+    # in-process, does not load it (and boto3, pymongo, bs4 with it) at start.
+    from builder.main import handler as builder_handler
+
+    html_content = html.decode(encoding, errors="replace")
+    response = builder_handler({"html_content": html_content, "listing_id": listing_id})
+    if response.get("statusCode") != 200:
+        logger.warning("Builder failed for listing %s: %s", listing_id, response.get("body"))
+        incr("builder_errors")
+        return False
+    return True
+
+
+@invocation("crawler")
+def main(
+    sink: Sink = send_to_builder,
+    incremental: bool = INCREMENTAL,
+    full_sweep: bool | None = None,
+    archive_location: str | None = ARCHIVE_LOCATION,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    flush_sink: Callable[[], None] | None = None,
+):
+    """
+    Crawl the site and hand each new or changed posting to ``sink`` as soon as
+    it is fetched, then delete listings that are no longer on the site.
+
+    ``sink`` returns whether the posting was delivered: ``False`` for a
+    failure, or a future for sinks that deliver later (``BatchProducer.send``),
+    which ``flush_sink`` forces at the end of the crawl. A posting's crawl
+    state is only recorded once it has been delivered.
+
+    Incremental crawls stop paging at the first run of unchanged index pages,
+    except for a periodic full sweep (see ``FULL_SWEEP_INTERVAL``). Deletions
+    are only synced after a full sweep, since a partial crawl does not see
+    every live listing.
+
+    With ``archive_location`` set, the full, untrimmed body of every fetched
+    posting is also written to the snapshot archive, so it can be replayed
+    through a future parser (``python -m builder.replay``).
+    """
+    client = get_mongo_client()
+    state = CrawlStateStore(get_crawl_state(client)) if incremental else None
+    if full_sweep is None:
+        full_sweep = state is None or state.full_sweep_due(FULL_SWEEP_INTERVAL)
+    sync = SyncRun(get_database(client), client) if full_sweep else None
+    archive = Archive(archive_location) if archive_location else None
+    logger.info("Starting %s crawl", "full" if full_sweep else "incremental")
+    metrics.set_property("crawl", "full" if full_sweep else "incremental")
+
+    def record_when_delivered(posting: Posting, delivery: bool | Future[bool] | None) -> None:
+        if state is None:
+            return
+        if isinstance(delivery, Future):
+
+            def on_done(done: Future[bool]) -> None:
+                if done.result():
+                    state.record(posting)
+
+            delivery.add_done_callback(on_done)
+        elif delivery is not False:
+            state.record(posting)
+
+    # Process new and changed listings (create, update, etc.) as they stream in
+    seen = 0
+    try:
+        for posting in iter_housing_postings(
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            state=state,
+            stop_after=None if full_sweep else STOP_AFTER_PAGES,
+        ):
+            seen += 1
+            if sync is not None:
+                sync.mark(posting.listing_id)
+            if not posting.changed:
+                continue
+            if archive is not None:
+                archive.add(posting.listing_id, posting.url, posting.raw, posting.encoding)
+            logger.debug("Processing listing with ID: %s", posting.listing_id)
+            incr("postings_changed")
+            try:
+                with span("sink"):
+                    delivery = sink(posting.listing_id, posting.html, posting.encoding)
+            except Exception as exc:
+                # One listing that cannot be delivered must not stop the
+                # crawl; it is not recorded, so the next crawl retries it.
+                logger.warning("Could not deliver listing %s: %s", posting.listing_id, exc)
+                incr("sink_errors")
+                delivery = False
+            record_when_delivered(posting, delivery)
+    except IncompleteCrawl as exc:
+        if sync is not None:
+            sync.abort()
+        logger.error("Crawl incomplete, skipped deletion sync: %s", exc)
+        incr("incomplete_crawls")
+        return
+    except BaseException:
+        if sync is not None:
+            sync.abort()
+        raise
+    finally:
+        # Deliver what is still buffered first, on every path, so that its
+        # confirmations are recorded before the crawl state is written.
+        try:
+            if flush_sink is not None:
+                flush_sink()
+        finally:
+            if state is not None:
+                state.flush()
+            if archive is not None:
+                archive.close()
+                incr("archived", archive.added)
+                incr("archive_duplicates", archive.duplicates)
+
+    if not seen:
+        if sync is not None:
+            sync.abort()
+        logger.warning("No housing information found")
+        return
+
+    if sync is None:
+        incr("postings_seen", seen)
+        logger.info("Crawl: %s listings checked, skipped deletion sync", seen)
+        return
+
+    # Listings not seen in this crawl are no longer on the site (delete)
+    try:
+        with span("sync"):
+            counts = sync.sweep()
+    except IncompleteCrawl as exc:
+        logger.error("Crawl incomplete, skipped deletion sync: %s", exc)
+        incr("incomplete_crawls")
+        return
+    if state is not None:
+        state.record_full_sweep()
+    incr("postings_seen", seen)
+    incr("listings_deleted", counts["deleted"])
+    logger.info(
+        "Sync: %s live listings, deleted %s stale listings", counts["seen"], counts["deleted"]
+    )
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
@@ -0,0 +1,111 @@
+"""Per-listing fingerprints used for incremental crawling."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from pymongo import UpdateOne
+
+# Crawl state documents are keyed by posting URL; this one records the last
+# crawl that walked the whole index.
+FULL_SWEEP_ID = "meta:full_sweep"
+
+
+def content_hash(data: bytes | str) -> str:
+    """Return a short, stable hex digest for a response body or index entry."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@dataclass
+class Posting:
+    """
+    A posting seen during a crawl. ``html`` holds the raw response bytes,
+    trimmed to the listing, in ``encoding``; ``raw`` the whole response body,
+    for the snapshot archive. Both are ``None`` when the posting is unchanged
+    since the previous crawl and its body was not (re)downloaded.
+    """
+
+    url: str
+    html: bytes | None
+    index_hash: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    encoding: str = "utf-8"
+    raw: bytes | None = None
+
+    @property
+    def listing_id(self) -> str:
+        return self.url.rstrip(" /").split("/")[-1]
+
+    @property
+    def changed(self) -> bool:
+        return self.html is not None
+
+
+class CrawlStateStore:
+    """
+    Reads and writes crawl fingerprints keyed by posting URL.
+
+    Writes are buffered and flushed with a single unordered ``bulk_write``
+    every ``flush_every`` records. ``record`` may be called from delivery
+    callbacks on other threads.
+    """
+
+    def __init__(self, collection, flush_every: int = 100):
+        self.collection = collection
+        self.flush_every = flush_every
+        self._pending: list[UpdateOne] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, urls: list[str]) -> dict[str, dict[str, Any]]:
+        if not urls:
+            return {}
+        cur = self.collection.find({"_id": {"$in": urls}})
+        return {doc["_id"]: doc for doc in cur}
+
+    def record(self, posting: Posting) -> None:
+        fields: dict[str, Any] = {
+            "listing_id": posting.listing_id,
+            "index_hash": posting.index_hash,
+            "checked_at": datetime.now(UTC),
+        }
+        # A 304 carries no body, so keep the validators and hash we already have.
+        if posting.content_hash is not None:
+            fields.update(
+                etag=posting.etag,
+                last_modified=posting.last_modified,
+                content_hash=posting.content_hash,
+            )
+        with self._lock:
+            self._pending.append(UpdateOne({"_id": posting.url}, {"$set": fields}, upsert=True))
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self.collection.bulk_write(pending, ordered=False)
+
+    def full_sweep_due(self, interval: timedelta) -> bool:
+        """Whether the last complete walk of the index is older than ``interval``."""
+        doc = self.collection.find_one({"_id": FULL_SWEEP_ID})
+        if doc is None:
+            return True
+        finished_at = doc["finished_at"]
+        if finished_at.tzinfo is None:
+            finished_at = finished_at.replace(tzinfo=UTC)
+        return datetime.now(UTC) - finished_at >= interval
+
+    def record_full_sweep(self) -> None:
+        self.collection.update_one(
+            {"_id": FULL_SWEEP_ID}, {"$set": {"finished_at": datetime.now(UTC)}}, upsert=True
+        )
@@ -0,0 +1,168 @@
+"""
+Deletion sync between a crawl and the postings collection.
+
+Listing ids seen during a crawl are streamed in chunks into a per-run scratch
+collection keyed by listing id. Once the crawl is over, the stale listings are
+the postings with no match in that collection: the set difference is computed
+on the server with a ``$lookup`` on the scratch collection's ``_id`` index, and
+only the ``_id`` values of stale postings come back, one cursor batch at a
+time, to be deleted in bounded chunks. Memory use and log volume stay flat as
+the collection grows.
+
+Run ids start with their creation time, so scratch collections left behind
+by a run that was killed (e.g. a Lambda timeout) are dropped by the next run.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+from pymongo.errors import BulkWriteError
+
+from shared.indexes import SYNC_SCAN_HINT, ensure_indexes_once
+from shared.mongo import get_sync_scratch, list_sync_scratch
+
+CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "1000"))
+# A crawl that saw fewer than this fraction of the stored postings is treated
+# as incomplete rather than as a mass deletion.
+MIN_SEEN_RATIO = float(os.getenv("SYNC_MIN_SEEN_RATIO", "0.5"))
+# Scratch collections older than this belong to runs that did not finish.
+SCRATCH_MAX_AGE = float(os.getenv("SYNC_SCRATCH_MAX_AGE_SECONDS", "3600"))
+
+DUPLICATE_KEY = 11000
+
+
+class IncompleteCrawl(Exception):
+    """The crawl did not see every live listing, so deletions must not be synced."""
+
+
+def new_run_id() -> str:
+    return f"{int(time.time())}_{uuid.uuid4().hex[:12]}"
+
+
+def drop_abandoned_scratch(client, max_age: float = SCRATCH_MAX_AGE) -> list[str]:
+    """
+    Drop the scratch collections of runs started more than ``max_age`` seconds
+    ago (or named before run ids carried a timestamp). Returns their run ids.
+    """
+    cutoff = time.time() - max_age
+    dropped = []
+    for run_id in list_sync_scratch(client):
+        started, _, _ = run_id.partition("_")
+        if started.isdigit() and int(started) >= cutoff:
+            continue
+        get_sync_scratch(client, run_id).drop()
+        dropped.append(run_id)
+    return dropped
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class SyncRun:
+    """
+    One crawl's view of which listings are live.
+
+    Call ``mark`` with listing ids as postings stream in, then ``sweep`` once
+    the crawl has finished to delete the postings that were not marked.
+    """
+
+    def __init__(
+        self,
+        postings,
+        client,
+        run_id: str | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        min_seen_ratio: float = MIN_SEEN_RATIO,
+    ):
+        self.postings = postings
+        drop_abandoned_scratch(client)
+        self.run_id = run_id or new_run_id()
+        self.scratch = get_sync_scratch(client, self.run_id)
+        self.chunk_size = chunk_size
+        self.min_seen_ratio = min_seen_ratio
+        # The crawler may be the first process to touch a fresh database.
+        ensure_indexes_once(postings)
+        self.seen = 0
+        self._pending: list[str] = []
+
+    def mark(self, listing_id: str) -> None:
+        self._pending.append(listing_id)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        documents = [{"_id": listing_id} for listing_id in self._pending]
+        self._pending = []
+        try:
+            self.scratch.insert_many(documents, ordered=False)
+            inserted = len(documents)
+        except BulkWriteError as exc:
+            # Ids marked twice in one run are duplicates, not failures.
+            errors = exc.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            inserted = len(documents) - len(errors)
+        self.seen += inserted
+
+    def stale_ids(self) -> Iterator[Any]:
+        """Stream the ``_id`` of every posting whose listing id was not marked."""
+        pipeline = [
+            {"$project": {"_id": 1, "listing_id": 1}},
+            {
+                "$lookup": {
+                    "from": self.scratch.name,
+                    "localField": "listing_id",
+                    "foreignField": "_id",
+                    "as": "live",
+                }
+            },
+            {"$match": {"live": {"$size": 0}}},
+            {"$project": {"_id": 1}},
+        ]
+        options: dict[str, Any] = {"batchSize": self.chunk_size}
+        # Hinting an index that does not exist (MONGO_ENSURE_INDEXES=0 on a
+        # fresh database) fails the whole aggregation, so only hint when present.
+        if any(
+            index["key"] == SYNC_SCAN_HINT for index in self.postings.index_information().values()
+        ):
+            options["hint"] = SYNC_SCAN_HINT
+        cursor = self.postings.aggregate(pipeline, **options)
+        for doc in cursor:
+            yield doc["_id"]
+
+    def sweep(self) -> dict[str, int]:
+        """
+        Delete the postings not marked in this run, ``chunk_size`` at a time,
+        and drop the scratch collection. Returns the sync counts.
+
+        Raises ``IncompleteCrawl`` without deleting anything when the run
+        marked fewer than ``min_seen_ratio`` of the stored postings.
+        """
+        self.flush()
+        deleted = 0
+        try:
+            stored = self.postings.estimated_document_count()
+            if self.seen < self.min_seen_ratio * stored:
+                raise IncompleteCrawl(f"saw {self.seen} of {stored} stored listings")
+            if self.seen:
+                for chunk in chunked(self.stale_ids(), self.chunk_size):
+                    deleted += self.postings.delete_many({"_id": {"$in": chunk}}).deleted_count
+        finally:
+            self.scratch.drop()
+        return {"seen": self.seen, "deleted": deleted}
+
+    def abort(self) -> None:
+        """Drop the scratch collection without deleting anything."""
+        self._pending = []
+        self.scratch.drop()
@@ -0,0 +1,46 @@
+"""Checks that the crawler archives whole posting bodies for replay."""
+
+from __future__ import annotations
+
+import tempfile
+
+import crawler.main
+from bench.site import SyntheticSite, render_posting
+from crawler.test.local import local_crawl
+from shared.archive import Archive
+
+
+def test_archives_untrimmed_bodies() -> None:
+    with (
+        tempfile.TemporaryDirectory() as root,
+        SyntheticSite(listings=5, per_page=5) as site,
+        local_crawl(site),
+    ):
+        trimmed: dict[str, bytes] = {}
+        crawler.main.main(
+            sink=lambda listing_id, html, encoding: trimmed.__setitem__(listing_id, html),  # noqa: ARG005
+            incremental=False,
+            full_sweep=True,
+            archive_location=root,
+            rate_limit=0,
+        )
+
+        latest = Archive(root).latest()
+        assert set(latest) == {str(listing_id) for listing_id in site.listing_ids}
+        for listing_id, entry in latest.items():
+            raw = Archive(root).read(entry)
+            assert raw == render_posting(int(listing_id)).encode("utf-8")
+            assert len(raw) > len(trimmed[listing_id])
+
+
+def main() -> int:
+    for test in (test_archives_untrimmed_bodies,):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All crawler archive checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
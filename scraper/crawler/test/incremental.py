@@ -0,0 +1,150 @@
+"""Checks for incremental crawling against the local synthetic site."""
+
+from __future__ import annotations
+
+from concurrent.futures import Future
+
+import crawler.main
+from bench.site import SyntheticSite
+from crawler.test.local import local_crawl
+
+
+class BreakableIndexSite(SyntheticSite):
+    """A site whose second index page fails while ``broken`` is set."""
+
+    broken = False
+
+    def respond(self, path: str) -> tuple[int, str]:
+        if self.broken and path.rstrip("/").endswith("/housing/page/2"):
+            return 500, "<html><body>Internal error</body></html>"
+        return super().respond(path)
+
+
+def crawl(sink) -> None:
+    crawler.main.main(
+        sink=sink, incremental=True, full_sweep=False, archive_location=None, rate_limit=0
+    )
+
+
+def test_failed_delivery_is_refetched() -> None:
+    with SyntheticSite(listings=30, per_page=10) as site, local_crawl(site):
+        failing = str(site.listing_ids[3])
+        delivered: list[str] = []
+
+        def flaky_sink(listing_id: str, html: bytes, encoding: str) -> bool:  # noqa: ARG001
+            delivered.append(listing_id)
+            return listing_id != failing
+
+        crawl(flaky_sink)
+        assert len(delivered) == site.listings
+
+        # Only the listing whose delivery failed is handed over again.
+        delivered.clear()
+        crawl(flaky_sink)
+        assert delivered == [failing]
+
+
+def test_sink_error_skips_only_that_listing() -> None:
+    with SyntheticSite(listings=20, per_page=10) as site, local_crawl(site):
+        failing = str(site.listing_ids[5])
+        broken = {failing}
+        delivered: list[str] = []
+
+        def sink(listing_id: str, html: bytes, encoding: str) -> bool:  # noqa: ARG001
+            if listing_id in broken:
+                raise ValueError("too large")
+            delivered.append(listing_id)
+            return True
+
+        crawl(sink)
+        assert len(delivered) == site.listings - 1
+
+        broken.clear()
+        delivered.clear()
+        crawl(sink)
+        assert delivered == [failing]
+
+
+def test_deferred_delivery_is_recorded_when_confirmed() -> None:
+    with SyntheticSite(listings=10, per_page=10) as site, local_crawl(site):
+        pending: dict[str, Future[bool]] = {}
+        failing = str(site.listing_ids[0])
+
+        def queue_sink(listing_id: str, html: bytes, encoding: str) -> Future[bool]:  # noqa: ARG001
+            pending[listing_id] = Future()
+            return pending[listing_id]
+
+        def flush() -> None:
+            for listing_id, delivery in pending.items():
+                delivery.set_result(listing_id != failing)
+
+        crawler.main.main(
+            sink=queue_sink,
+            incremental=True,
+            full_sweep=False,
+            archive_location=None,
+            rate_limit=0,
+            flush_sink=flush,
+        )
+        assert len(pending) == site.listings
+
+        pending.clear()
+        crawl(queue_sink)
+        assert list(pending) == [failing]
+
+
+def test_incomplete_crawl_records_flushed_deliveries() -> None:
+    with BreakableIndexSite(listings=30, per_page=10) as site, local_crawl(site):
+        buffered: list[tuple[str, Future[bool]]] = []
+        delivered: list[str] = []
+
+        def queue_sink(listing_id: str, html: bytes, encoding: str) -> Future[bool]:  # noqa: ARG001
+            buffered.append((listing_id, Future()))
+            return buffered[-1][1]
+
+        def flush() -> None:
+            for listing_id, delivery in buffered:
+                delivered.append(listing_id)
+                delivery.set_result(True)
+            buffered.clear()
+
+        def run() -> None:
+            crawler.main.main(
+                sink=queue_sink,
+                incremental=True,
+                full_sweep=True,
+                archive_location=None,
+                rate_limit=0,
+                flush_sink=flush,
+            )
+
+        site.broken = True
+        run()
+        assert len(delivered) == 10
+
+        # The first page's listings were confirmed and recorded despite the
+        # failure, so only the unreached pages are handed over now.
+        site.broken = False
+        first_page = set(delivered)
+        delivered.clear()
+        run()
+        assert len(delivered) == 20
+        assert not first_page & set(delivered)
+
+
+def main() -> int:
+    for test in (
+        test_failed_delivery_is_refetched,
+        test_sink_error_skips_only_that_listing,
+        test_deferred_delivery_is_recorded_when_confirmed,
+        test_incomplete_crawl_records_flushed_deliveries,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All incremental crawl checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
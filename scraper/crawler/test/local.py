@@ -0,0 +1,24 @@
+"""Points the crawler at a local synthetic site and an in-memory Mongo for a test."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import mongomock
+
+import crawler.main
+from bench.site import SyntheticSite
+from shared import mongo
+
+
+@contextmanager
+def local_crawl(site: SyntheticSite) -> Iterator[mongomock.MongoClient]:
+    """Crawl ``site`` with a fresh mongomock client, restoring both afterwards."""
+    previous = crawler.main.API_URL, mongo._client
+    crawler.main.API_URL = site.url
+    mongo._client = mongomock.MongoClient()
+    try:
+        yield mongo._client
+    finally:
+        crawler.main.API_URL, mongo._client = previous
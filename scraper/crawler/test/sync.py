@@ -0,0 +1,96 @@
+"""Checks that deletion sync never runs on an incomplete crawl."""
+
+from __future__ import annotations
+
+import time
+
+import mongomock
+
+import crawler.main
+from bench.site import SyntheticSite
+from crawler.sync import IncompleteCrawl, SyncRun, drop_abandoned_scratch
+from crawler.test.local import local_crawl
+from shared.mongo import get_database, get_sync_scratch, list_sync_scratch
+
+
+class FlakyIndexSite(SyntheticSite):
+    """A site whose second index page always fails."""
+
+    def respond(self, path: str) -> tuple[int, str]:
+        if path.rstrip("/").endswith("/housing/page/2"):
+            return 500, "<html><body>Internal error</body></html>"
+        return super().respond(path)
+
+
+def test_failed_index_page_skips_sync() -> None:
+    with FlakyIndexSite(listings=30, per_page=10) as site, local_crawl(site) as client:
+        postings = get_database(client)
+        postings.insert_many([{"listing_id": str(i)} for i in site.listing_ids])
+        delivered: list[str] = []
+        crawler.main.main(
+            sink=lambda listing_id, html, encoding: delivered.append(listing_id),  # noqa: ARG005
+            incremental=False,
+            full_sweep=True,
+            archive_location=None,
+            rate_limit=0,
+        )
+
+    # Page 1 was delivered, but listings on the unreached pages are kept.
+    assert len(delivered) == 10
+    assert postings.count_documents({}) == 30
+    assert not [name for name in client["housing"].list_collection_names() if "sync_" in name]
+
+
+def test_sweep_refuses_when_too_few_seen() -> None:
+    client = mongomock.MongoClient()
+    postings = get_database(client)
+    postings.insert_many([{"listing_id": str(i)} for i in range(10)])
+
+    sync = SyncRun(postings, client, min_seen_ratio=0.5)
+    for listing_id in ("0", "1"):
+        sync.mark(listing_id)
+    try:
+        sync.sweep()
+    except IncompleteCrawl:
+        pass
+    else:
+        raise AssertionError("sweep should refuse an incomplete crawl")
+    assert postings.count_documents({}) == 10
+
+    sync = SyncRun(postings, client, min_seen_ratio=0.5)
+    for listing_id in map(str, range(6)):
+        sync.mark(listing_id)
+    assert sync.sweep() == {"seen": 6, "deleted": 4}
+
+
+def test_drops_abandoned_scratch() -> None:
+    client = mongomock.MongoClient()
+    for run_id in ("1000_old", "0123abcdef", f"{int(time.time())}_live"):
+        get_sync_scratch(client, run_id).insert_one({"_id": "1"})
+
+    assert sorted(drop_abandoned_scratch(client, max_age=3600)) == ["0123abcdef", "1000_old"]
+    (live,) = list_sync_scratch(client)
+    assert live.endswith("_live")
+
+    # A new run clears abandoned scratch collections before it starts.
+    get_sync_scratch(client, "1000_old").insert_one({"_id": "1"})
+    sync = SyncRun(get_database(client), client)
+    assert sorted(list_sync_scratch(client)) == [live]
+    sync.abort()
+
+
+def main() -> int:
+    for test in (
+        test_failed_index_page_skips_sync,
+        test_sweep_refuses_when_too_few_seen,
+        test_drops_abandoned_scratch,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All sync checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
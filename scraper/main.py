@@ -1,16 +1,22 @@
 import json
+import logging
 import os
 
-import boto3
+from crawler.main import main as crawl
+from shared.metrics import incr, invocation
+from shared.queue import BatchProducer, get_client
 
+logger = logging.getLogger(__name__)
 
+
+@invocation("producer")
 def lambda_handler(event, context):
     """
-    Producer Lambda handler - sends Hello World message to SQS queue
+    Producer Lambda handler - crawls the site and sends listings to the SQS queue
     """
     try:
-        # Create SQS client up-front so it's available regardless of which branch we take
-        sqs = boto3.client("sqs")
+        # Shared with the rest of the process and reused across warm invocations
+        sqs = get_client("sqs")
 
         # Prefer explicit queue URL from environment to avoid GetQueueUrl lookup
         queue_url = os.environ.get("QUEUE_URL")
@@ -29,24 +35,22 @@ def lambda_handler(event, context):
             queue_url_response = sqs.get_queue_url(QueueName=queue_name)
             queue_url = queue_url_response["QueueUrl"]
 
-        # Create the message
-        message = {
-            "message": "Hello World from Producer Lambda!",
-            "timestamp": str(context.aws_request_id) if context else "local",
-            "producer_function": context.function_name if context else "local_test",
-        }
-
-        # Send message to queue
-        response = sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps(message))
+        # Crawl the site and enqueue every new or changed listing in batches
+        with BatchProducer(queue_url, sqs=sqs) as producer:
+            crawl(sink=producer.send, flush_sink=producer.flush)
 
-        print(f"Message sent to queue. MessageId: {response.get('MessageId')}")
+        incr("sent", producer.sent)
+        incr("offloaded", producer.offloaded)
+        incr("send_failures", len(producer.failed))
 
         return {
-            "statusCode": 200,
+            "statusCode": 200 if not producer.failed else 207,
             "body": json.dumps(
                 {
-                    "message": "Hello World message sent to queue",
-                    "message_id": response.get("MessageId"),
+                    "message": "Listings sent to queue",
+                    "sent_count": producer.sent,
+                    "offloaded_count": producer.offloaded,
+                    "failed_count": len(producer.failed),
                     "queue_name": queue_name,
                     "queue_url": queue_url,
                 }
@@ -54,5 +58,5 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        print(f"Error sending message to queue: {str(e)}")
+        logger.exception("Error sending listings to queue: %s", e)
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
@@ -0,0 +1,310 @@
+"""
+Content-addressed archive of raw posting HTML.
+
+Postings are stored as compressed blobs packed into append-only segment
+files. Each segment has an NDJSON index, written when the segment is sealed,
+with one line per posting: its content hash, listing id, URL, encoding and
+the segment, offset and length of its blob. Identical bodies are stored once
+and later index lines point back at the first copy; a posting whose body is
+unchanged since it was last archived is skipped. Segment names sort by
+creation time, so reading the indexes in order replays postings in the order
+they were fetched.
+
+Writers do not read the indexes. A manifest holds the latest entry of each
+listing archived in the last ``ARCHIVE_MANIFEST_DAYS``, and deduplication only
+looks at those, so its size follows the live listings rather than the
+archive's history. It is rewritten whenever a segment is sealed.
+
+The archive lives in a local directory or under an ``s3://bucket/prefix``
+URL; set ``ARCHIVE_S3_ENDPOINT`` for S3-compatible stores such as MinIO.
+
+    segments/<segment>.seg     compressed blobs, back to back
+    index/<segment>.ndjson     one JSON line per archived posting
+    manifest.json              latest recent entry per listing id
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from .payload import COMPRESSION, compress, decompress
+
+# Seal the open segment once it holds this many compressed bytes.
+SEGMENT_BYTES = int(os.getenv("ARCHIVE_SEGMENT_BYTES", str(32 * 1024 * 1024)))
+# Listings not archived for this long drop out of the manifest (and are
+# stored again if they come back).
+MANIFEST_MAX_AGE = timedelta(days=float(os.getenv("ARCHIVE_MANIFEST_DAYS", "90")))
+MANIFEST = "manifest.json"
+
+
+def blob_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def new_segment_name() -> str:
+    return f"{datetime.now(UTC):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+
+class LocalStore:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def put(self, name: str, data: bytes) -> None:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    def get(self, name: str, start: int = 0, length: int | None = None) -> bytes:
+        with open(self.root / name, "rb") as f:
+            f.seek(start)
+            return f.read() if length is None else f.read(length)
+
+    def get_if_exists(self, name: str) -> bytes | None:
+        try:
+            return self.get(name)
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix: str) -> list[str]:
+        directory = self.root / prefix
+        if not directory.is_dir():
+            return []
+        return sorted(
+            f"{prefix}/{path.name}" for path in directory.iterdir() if path.suffix != ".tmp"
+        )
+
+
+class S3Store:
+    def __init__(self, bucket: str, prefix: str = "", s3=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3 = s3
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            import boto3
+
+            self._s3 = boto3.client("s3", endpoint_url=os.getenv("ARCHIVE_S3_ENDPOINT"))
+        return self._s3
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def put(self, name: str, data: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(name), Body=data)
+
+    def get(self, name: str, start: int = 0, length: int | None = None) -> bytes:
+        kwargs = {}
+        if start or length is not None:
+            end = "" if length is None else start + length - 1
+            kwargs["Range"] = f"bytes={start}-{end}"
+        obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(name), **kwargs)
+        return obj["Body"].read()
+
+    def get_if_exists(self, name: str) -> bytes | None:
+        try:
+            return self.get(name)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def list(self, prefix: str) -> list[str]:
+        names = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix) + "/"):
+            for obj in page.get("Contents", []):
+                names.append(obj["Key"][len(self.prefix) + 1 :] if self.prefix else obj["Key"])
+        return sorted(names)
+
+
+def open_store(location: str) -> LocalStore | S3Store:
+    if location.startswith("s3://"):
+        bucket, _, prefix = location.removeprefix("s3://").partition("/")
+        return S3Store(bucket, prefix)
+    return LocalStore(location)
+
+
+class Archive:
+    """
+    Appends postings to the open segment and reads them back by index entry.
+    Call ``close`` (or use the archive as a context manager) to seal the last
+    segment; postings in an unsealed segment are not visible to readers.
+    """
+
+    def __init__(
+        self,
+        location: str | LocalStore | S3Store,
+        segment_bytes: int = SEGMENT_BYTES,
+        compression: str = COMPRESSION,
+    ):
+        self.store = open_store(location) if isinstance(location, str) else location
+        self.segment_bytes = segment_bytes
+        self.compression = compression
+        self.added = 0
+        self.duplicates = 0
+        # Latest entry by listing id (the manifest), and blob location by
+        # content hash for the blobs those entries point at
+        self._latest: dict[str, dict[str, Any]] | None = None
+        self._known: dict[str, dict[str, Any]] = {}
+        self._segment_name: str | None = None
+        self._segment = bytearray()
+        self._entries: list[dict[str, Any]] = []
+
+    # Writing
+
+    def add(self, listing_id: str, url: str, html: bytes, encoding: str = "utf-8") -> str:
+        """Archive one posting body and return its content hash."""
+        digest = blob_hash(html)
+        if self._latest is None:
+            self._latest = self.load_manifest()
+            for entry in self._latest.values():
+                self._known.setdefault(entry["hash"], entry)
+        previous = self._latest.get(listing_id)
+        if previous is not None and previous["hash"] == digest:
+            self.duplicates += 1
+            return digest
+
+        location = self._known.get(digest)
+        if location is None:
+            if self._segment_name is None:
+                self._segment_name = new_segment_name()
+            blob = compress(html, self.compression)
+            location = {
+                "segment": self._segment_name,
+                "compression": self.compression,
+                "offset": len(self._segment),
+                "length": len(blob),
+            }
+            self._segment += blob
+            self._known[digest] = location
+            self.added += 1
+        else:
+            self.duplicates += 1
+
+        entry = {
+            "hash": digest,
+            "listing_id": listing_id,
+            "url": url,
+            "encoding": encoding,
+            "segment": location["segment"],
+            "compression": location["compression"],
+            "offset": location["offset"],
+            "length": location["length"],
+            "fetched_at": datetime.now(UTC).isoformat(),
+        }
+        self._entries.append(entry)
+        self._latest[listing_id] = entry
+        if len(self._segment) >= self.segment_bytes:
+            self.seal()
+        return digest
+
+    def seal(self) -> None:
+        """Write the open segment and its index."""
+        if not self._entries:
+            return
+        # A segment may hold only index lines pointing at earlier blobs.
+        segment = self._segment_name or new_segment_name()
+        self.store.put(f"segments/{segment}.seg", bytes(self._segment))
+        # The index goes last: a segment without one is never read.
+        lines = "".join(json.dumps(entry) + "\n" for entry in self._entries)
+        self.store.put(f"index/{segment}.ndjson", lines.encode("utf-8"))
+        self._segment_name = None
+        self._segment = bytearray()
+        self._entries = []
+        self.write_manifest()
+
+    def load_manifest(self) -> dict[str, dict[str, Any]]:
+        """
+        The latest recent entry per listing id. Archives written before the
+        manifest existed are indexed once, from their segment indexes.
+        """
+        data = self.store.get_if_exists(MANIFEST)
+        if data is not None:
+            return json.loads(data)["listings"]
+        latest: dict[str, dict[str, Any]] = {}
+        for entry in self.entries():
+            latest[entry["listing_id"]] = entry
+        return self._prune(latest)
+
+    def write_manifest(self) -> None:
+        if self._latest is None:
+            return
+        self._latest = self._prune(self._latest)
+        self._known = {}
+        for entry in self._latest.values():
+            self._known.setdefault(entry["hash"], entry)
+        manifest = {"updated_at": datetime.now(UTC).isoformat(), "listings": self._latest}
+        self.store.put(MANIFEST, json.dumps(manifest).encode("utf-8"))
+
+    @staticmethod
+    def _prune(latest: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        cutoff = (datetime.now(UTC) - MANIFEST_MAX_AGE).isoformat()
+        return {
+            listing_id: entry
+            for listing_id, entry in latest.items()
+            if entry["fetched_at"] >= cutoff
+        }
+
+    def close(self) -> None:
+        self.seal()
+
+    def __enter__(self) -> Archive:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Reading
+
+    def segments(self) -> list[str]:
+        return [
+            name.removeprefix("index/").removesuffix(".ndjson")
+            for name in self.store.list("index")
+            if name.endswith(".ndjson")
+        ]
+
+    def segment_entries(self, segment: str) -> list[dict[str, Any]]:
+        lines = self.store.get(f"index/{segment}.ndjson").decode("utf-8").splitlines()
+        return [json.loads(line) for line in lines if line]
+
+    def entries(self) -> Iterator[dict[str, Any]]:
+        """Every index entry, oldest segment first."""
+        for segment in self.segments():
+            yield from self.segment_entries(segment)
+
+    def latest(self) -> dict[str, dict[str, Any]]:
+        """The most recently archived entry for each listing id."""
+        return {entry["listing_id"]: entry for entry in self.entries()}
+
+    def read(self, entry: dict[str, Any]) -> bytes:
+        """Return the raw HTML bytes for an index entry."""
+        blob = self.store.get(f"segments/{entry['segment']}.seg", entry["offset"], entry["length"])
+        return decompress(blob, entry["compression"])
+
+    def read_many(self, entries: list[dict[str, Any]]) -> Iterator[tuple[dict[str, Any], bytes]]:
+        """
+        Yield ``(entry, raw HTML)`` for entries that share one segment, reading
+        the span of the segment that covers all of them with a single request.
+        """
+        if not entries:
+            return
+        segments = {entry["segment"] for entry in entries}
+        if len(segments) != 1:
+            raise ValueError("read_many() entries must come from one segment")
+
+        start = min(entry["offset"] for entry in entries)
+        end = max(entry["offset"] + entry["length"] for entry in entries)
+        span = self.store.get(f"segments/{segments.pop()}.seg", start, end - start)
+        for entry in entries:
+            offset = entry["offset"] - start
+            blob = span[offset : offset + entry["length"]]
+            yield entry, decompress(blob, entry["compression"])
@@ -0,0 +1,15 @@
+import os
+
+
+def load_local_env() -> None:
+    """
+    Load environment variables from a .env file for local runs. Lambda gets its
+    configuration from the function environment, so python-dotenv is not even
+    imported there.
+    """
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
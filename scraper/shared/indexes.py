@@ -0,0 +1,219 @@
+"""
+Index bootstrap for the postings collection.
+
+Run ``python -m shared.indexes`` to create any missing indexes and drop
+obsolete ones, or add ``--explain`` to print the query plans of the hot
+queries as well. Unique indexes are only created here: if the collection
+holds duplicate listings the command stops, and ``--dedupe`` removes all but
+the newest copy of each first. Cold starts only create the other indexes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+from datetime import UTC, datetime
+from typing import Any
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from .mongo import close_mongo_client, get_database, get_mongo_client
+
+POSTINGS_INDEXES = [
+    # Lookups and upserts by listing in the builder
+    IndexModel([("listing_id", ASCENDING)], name="listing_id_unique", unique=True),
+    # Covers the (listing_id, _id) scan used to sync deletions
+    IndexModel([("listing_id", ASCENDING), ("_id", ASCENDING)], name="listing_id__id"),
+    # Frontend filters, on the typed fields (see builder/record.py)
+    IndexModel([("price_cents", ASCENDING)], name="price_cents"),
+    IndexModel([("beds_count", ASCENDING)], name="beds_count"),
+    IndexModel([("date_available_at", ASCENDING)], name="date_available_at"),
+    # Pending listings picked up by the deferred enrichment worker
+    IndexModel(
+        [("enrichment_status", ASCENDING)],
+        name="enrichment_pending",
+        partialFilterExpression={"enrichment_status": "pending"},
+    ),
+]
+
+# Replaced by the typed-field indexes above; dropped by ``python -m shared.indexes``.
+OBSOLETE_INDEXES = ["price", "beds", "date_available"]
+
+SYNC_SCAN_HINT = [("listing_id", ASCENDING), ("_id", ASCENDING)]
+
+# Set MONGO_ENSURE_INDEXES=0 to skip the check at cold start.
+ENSURE_AT_STARTUP = os.getenv("MONGO_ENSURE_INDEXES", "1") == "1"
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes(collection, unique: bool = True) -> list[str]:
+    """
+    Create the postings indexes. Existing indexes with the same definition are
+    left untouched, so this is safe to run repeatedly. ``unique=False`` skips
+    the unique ones. Returns the index names.
+    """
+    indexes = [index for index in POSTINGS_INDEXES if unique or not index.document.get("unique")]
+    return collection.create_indexes(indexes)
+
+
+def ensure_indexes_once(collection) -> None:
+    """
+    Create the non-unique indexes once per process (e.g. on a Lambda cold
+    start). A failure, such as a conflicting index definition, is logged and
+    does not stop the handler; ``python -m shared.indexes`` reports it.
+    """
+    global _ensured
+    if _ensured or not ENSURE_AT_STARTUP:
+        return
+
+    with _ensure_lock:
+        if not _ensured:
+            try:
+                ensure_indexes(collection, unique=False)
+            except OperationFailure as exc:
+                logger.warning("Could not ensure the postings indexes: %s", exc)
+            _ensured = True
+
+
+def duplicate_listings(collection) -> dict[str, list[Any]]:
+    """``_id``s of the listings stored more than once, newest last, by listing id."""
+    pipeline = [
+        {"$sort": {"_id": ASCENDING}},
+        {"$group": {"_id": "$listing_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    return {group["_id"]: group["ids"] for group in collection.aggregate(pipeline)}
+
+
+def drop_duplicate_listings(collection) -> int:
+    """Delete all but the newest document of each listing. Returns the number deleted."""
+    stale = [_id for ids in duplicate_listings(collection).values() for _id in ids[:-1]]
+    if not stale:
+        return 0
+    return collection.delete_many({"_id": {"$in": stale}}).deleted_count
+
+
+def drop_obsolete_indexes(collection) -> list[str]:
+    """Drop indexes the hot queries no longer use. Returns the dropped names."""
+    existing = set(collection.index_information())
+    dropped = [name for name in OBSOLETE_INDEXES if name in existing]
+    for name in dropped:
+        collection.drop_index(name)
+    return dropped
+
+
+def missing_indexes(collection) -> list[str]:
+    """Return the names of required indexes that do not exist on ``collection``."""
+    existing = set(collection.index_information())
+    return [
+        index.document["name"]
+        for index in POSTINGS_INDEXES
+        if index.document["name"] not in existing
+    ]
+
+
+def hot_queries(collection) -> dict[str, Any]:
+    """The queries the scraper runs on every crawl or batch, as cursors."""
+    return {
+        "builder_lookup": collection.find(
+            {"listing_id": {"$in": ["0", "1"]}},
+            {"listing_id": 1, "field_hashes": 1, "check_sum_json": 1, "check_sum_description": 1},
+        ),
+        "sync_scan": collection.find({}, {"_id": 1, "listing_id": 1}).hint(SYNC_SCAN_HINT),
+        "price_filter": collection.find({"price_cents": {"$gte": 50_000, "$lte": 120_000}}).sort(
+            "price_cents", ASCENDING
+        ),
+        "beds_filter": collection.find({"beds_count": {"$gte": 2}}),
+        "date_available_filter": collection.find(
+            {"date_available_at": {"$gte": datetime(2026, 1, 1, tzinfo=UTC)}}
+        ).sort("date_available_at", ASCENDING),
+    }
+
+
+def _stages(plan: dict[str, Any]) -> list[str]:
+    stages = [plan.get("stage", "?")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+def explain_hot_queries(collection) -> dict[str, dict[str, Any]]:
+    """
+    Summarise the winning plan of each hot query: its stages, whether it used
+    an index, and whether it was covered (no documents fetched).
+    """
+    report = {}
+    for name, cursor in hot_queries(collection).items():
+        explain = cursor.explain()
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _stages(plan)
+        stats = explain.get("executionStats", {})
+        report[name] = {
+            "stages": stages,
+            "uses_index": "IXSCAN" in stages,
+            "covered": "IXSCAN" in stages and "FETCH" not in stages and "COLLSCAN" not in stages,
+            "docs_examined": stats.get("totalDocsExamined"),
+        }
+    return report
+
+
+def migrate(collection, dedupe: bool = False, explain: bool = False) -> int:
+    """Dedupe (optionally), create and verify the indexes. Returns the exit code."""
+    if dedupe:
+        print(f"Deleted {drop_duplicate_listings(collection)} duplicate listings")
+    duplicates = duplicate_listings(collection)
+    if duplicates:
+        print(
+            f"[ERROR] {len(duplicates)} listings are stored more than once "
+            f"(e.g. {next(iter(duplicates))}); rerun with --dedupe"
+        )
+        return 1
+
+    print(f"Ensured indexes: {', '.join(ensure_indexes(collection))}")
+    dropped = drop_obsolete_indexes(collection)
+    if dropped:
+        print(f"Dropped obsolete indexes: {', '.join(dropped)}")
+
+    missing = missing_indexes(collection)
+    if missing:
+        print(f"[ERROR] Missing indexes: {', '.join(missing)}")
+        return 1
+
+    if explain:
+        print(json.dumps(explain_hot_queries(collection), indent=2))
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Create and verify the postings indexes")
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Delete all but the newest copy of duplicated listings before creating indexes",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print the query plans of the hot queries after creating indexes",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        return migrate(get_database(get_mongo_client()), args.dedupe, args.explain)
+    finally:
+        close_mongo_client()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
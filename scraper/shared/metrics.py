@@ -0,0 +1,243 @@
+"""
+Lightweight timing and counter instrumentation.
+
+Stages are timed with ``span`` (a context manager) or ``timed`` (a decorator),
+counts are added with ``incr``, and ``invocation`` wraps a Lambda handler so
+that everything recorded during the call is written as one structured line
+when it returns:
+
+    @invocation("builder")
+    def handler(event, context): ...
+
+    with span("fetch"):
+        ...
+    incr("pages")
+
+The line is CloudWatch Embedded Metric Format by default, so the values become
+metrics without any API calls (``METRICS_FORMAT=json`` writes plain JSON).
+
+Stage spans accumulate their total time and call count. Per-listing spans pass
+``sample=True`` and are only timed for a ``METRICS_SAMPLE_RATE`` fraction of
+calls; their individual durations (up to ``MAX_SAMPLES``) are emitted so that
+CloudWatch can report percentiles. With ``METRICS_ENABLED=0`` every call
+returns immediately and spans are a shared no-op context manager.
+
+Recorded values are process-wide, so worker threads started by an entry point
+record into its line. Entry points that overlap, whether nested or running on
+other threads, share one line, emitted when the last of them returns.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from typing import Any, TypeVar
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.1"))
+FORMAT = os.getenv("METRICS_FORMAT", "emf")
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "HousingScraper")
+
+# Sampled durations kept per span name (EMF accepts up to 100 values per metric).
+MAX_SAMPLES = 100
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_NOOP = nullcontext()
+
+
+class Metrics:
+    """Counters and span timings for the current invocation."""
+
+    def __init__(
+        self,
+        enabled: bool = ENABLED,
+        sample_rate: float = SAMPLE_RATE,
+        fmt: str = FORMAT,
+        namespace: str = NAMESPACE,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.format = fmt
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        # Entry points currently running in the process, and nesting on this thread
+        self._open = 0
+        self._function = ""
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self.counters: dict[str, float] = {}
+        self.totals: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.samples: dict[str, list[float]] = {}
+        self.properties: dict[str, Any] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Add to counter ``name``; names ending in ``_bytes`` are reported as bytes."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_property(self, name: str, value: Any) -> None:
+        """Attach a non-metric value (an id, a mode) to the emitted line."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.properties[name] = value
+
+    def record(self, name: str, elapsed_ms: float, sampled: bool = False) -> None:
+        with self._lock:
+            if sampled:
+                samples = self.samples.setdefault(name, [])
+                if len(samples) < MAX_SAMPLES:
+                    samples.append(round(elapsed_ms, 3))
+            else:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed_ms
+                self.calls[name] = self.calls.get(name, 0) + 1
+
+    def span(self, name: str, sample: bool = False):
+        """Time a block as stage ``name`` (or as a sampled per-item span)."""
+        if not self.enabled or (sample and random.random() >= self.sample_rate):
+            return _NOOP
+        return self._span(name, sample)
+
+    @contextmanager
+    def _span(self, name: str, sampled: bool) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, sampled)
+
+    def timed(self, name: str | None = None, sample: bool = False) -> Callable[[F], F]:
+        """Decorator form of ``span``; the span defaults to the function name."""
+
+        def decorate(fn: F) -> F:
+            if not self.enabled:
+                return fn
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, sample):
+                    return fn(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+    def snapshot(self) -> dict[str, Any]:
+        """Everything recorded so far, as flat metric name -> value(s)."""
+        with self._lock:
+            return self._values()
+
+    def _values(self) -> dict[str, Any]:
+        values: dict[str, Any] = dict(self.counters)
+        for name, total in self.totals.items():
+            values[f"{name}_ms"] = round(total, 3)
+            values[f"{name}_calls"] = self.calls[name]
+        for name, samples in self.samples.items():
+            values[f"{name}_sample_ms"] = list(samples)
+        return values
+
+    def emit(self, function: str, stream=None) -> dict[str, Any] | None:
+        """Write one line with everything recorded, then reset. Returns the line."""
+        if not self.enabled:
+            return None
+        # Take and clear in one step, so values recorded by other threads
+        # meanwhile go to the next line rather than being dropped.
+        with self._lock:
+            values, properties = self._values(), self.properties
+            self._clear()
+        line: dict[str, Any] = {"function": function, **properties, **values}
+        if self.sample_rate < 1:
+            line["sample_rate"] = self.sample_rate
+        if self.format == "emf":
+            line["_aws"] = {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [["function"]],
+                        "Metrics": [{"Name": name, "Unit": _unit(name)} for name in sorted(values)],
+                    }
+                ],
+            }
+        print(json.dumps(line, default=str), file=stream or sys.stdout, flush=True)
+        return line
+
+    def invocation(self, function: str) -> Callable[[F], F]:
+        """
+        Decorator for entry points: starts from a clean slate, times the whole
+        call as ``invocation`` and emits the line when it returns or raises.
+        An entry point called while another is running (e.g. the builder run
+        in-process by the crawler, or on a consumer thread of the load test)
+        records into the running invocation instead.
+        """
+
+        def decorate(fn: F) -> F:
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, "depth", 0) or not self.enabled:
+                    return fn(*args, **kwargs)
+                with self._lock:
+                    first = self._open == 0
+                    if first:
+                        self._clear()
+                        self._function = function
+                    self._open += 1
+                self._local.depth = 1
+                try:
+                    with self.span("invocation") if first else _NOOP:
+                        return fn(*args, **kwargs)
+                finally:
+                    self._local.depth = 0
+                    # The last one out emits, and only then lets a new
+                    # invocation start from a clean slate.
+                    with self._lock:
+                        last = self._open == 1
+                        if not last:
+                            self._open -= 1
+                    if last:
+                        try:
+                            self.emit(self._function)
+                        finally:
+                            with self._lock:
+                                self._open -= 1
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+
+def _unit(name: str) -> str:
+    if name.endswith("_ms"):
+        return "Milliseconds"
+    if name.endswith("_bytes"):
+        return "Bytes"
+    return "Count"
+
+
+metrics = Metrics()
+
+span = metrics.span
+timed = metrics.timed
+incr = metrics.incr
+invocation = metrics.invocation
@@ -1,24 +1,149 @@
 import os
+import threading
+import time
 
-from bson import ObjectId
-from dotenv import load_dotenv
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 
-load_dotenv()
+from .config import load_local_env
+
+load_local_env()
 
 # IF YOU ARE HAVING ISSUES CONNECTING TO MONGO DB, MAKE SURE IP ADDRESS IS ADDED
 # https://cloud.mongodb.com/v2/690f7ebe9b586528bc78f832#/security/network/accessList
 
 
-def get_mongo_client():
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Connection-pool counters for the shared client, including how long
+    callers waited to check a connection out of the pool.
     """
-    Initialize and return a MongoDB client using environment variables.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def snapshot(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "total_wait_ms": round(self.total_wait_ms, 3),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        started = getattr(self._local, "started", None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+_client: MongoClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
     """
-    connection_string = os.getenv("MONGO_CONNECTION_STRING")
-    if not connection_string:
-        raise ValueError("MONGO_CONNECTION_STRING environment variable is not set")
+    Return the process-wide MongoDB client, creating it on first use.
 
-    return MongoClient(connection_string)
+    The client is thread-safe and is reused across warm Lambda invocations, so
+    callers must not close it. Pool size and timeouts can be tuned with the
+    MONGO_* environment variables below.
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            connection_string = os.getenv("MONGO_CONNECTION_STRING")
+            if not connection_string:
+                raise ValueError("MONGO_CONNECTION_STRING environment variable is not set")
+
+            _client = MongoClient(
+                connection_string,
+                maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+                minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+                serverSelectionTimeoutMS=int(
+                    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+                ),
+                connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+                waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+                event_listeners=[pool_metrics],
+            )
+    return _client
+
+
+def close_mongo_client() -> None:
+    """Close the shared client (e.g. at the end of a CLI run)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_pool_stats() -> dict[str, int | float]:
+    """Return connection-pool counters for the shared client."""
+    return pool_metrics.snapshot()
 
 
 def get_database(client):
@@ -28,42 +153,37 @@ def get_database(client):
     return client["housing"]["postings"]
 
 
-def delete_id(id: list[str | ObjectId]) -> int:
+def get_crawl_state(client):
+    """
+    Get the collection holding per-listing crawl fingerprints (ETag,
+    Last-Modified, content and index-entry hashes).
+    """
+    return client["housing"]["crawl_state"]
+
+
+def get_extraction_cache_collection(client):
     """
-    Takes a list of listing IDs and deletes them from the database.
+    Get the collection caching description extraction results by content hash.
+    """
+    return client["housing"]["extraction_cache"]
+
+
+SYNC_SCRATCH_PREFIX = "sync_"
+
 
-    Parameters:
-    - id: List of listing IDs (as strings or ObjectIds)
+def get_sync_scratch(client, run_id: str):
+    """
+    Get the scratch collection holding the listing ids seen by one crawl run.
+    """
+    return client["housing"][f"{SYNC_SCRATCH_PREFIX}{run_id}"]
 
-    Returns:
-    - int: Number of IDs deleted
+
+def list_sync_scratch(client) -> list[str]:
+    """
+    Return the run ids of every sync scratch collection, live or abandoned.
     """
-    client = get_mongo_client()
-    collection = get_database(client)
-
-    try:
-        # Convert all IDs to ObjectId instances
-        object_ids = []
-        for id_str in id:
-            try:
-                if isinstance(id_str, str):
-                    object_ids.append(ObjectId(id_str))
-                elif isinstance(id_str, ObjectId):
-                    object_ids.append(id_str)
-                else:
-                    continue
-            except Exception:
-                continue
-
-        if not object_ids:
-            return 0
-
-        # Delete listings with the given IDs
-        filter_query = {"_id": {"$in": object_ids}}
-
-        # Delete the listings
-        result = collection.delete_many(filter_query)
-
-        return result.deleted_count
-    finally:
-        client.close()
+    return [
+        name.removeprefix(SYNC_SCRATCH_PREFIX)
+        for name in client["housing"].list_collection_names()
+        if name.startswith(SYNC_SCRATCH_PREFIX)
+    ]
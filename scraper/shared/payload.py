@@ -0,0 +1,99 @@
+"""
+Compact listing HTML payloads passed from the crawler to the builder.
+
+The crawler keeps the raw response bytes in their original encoding, trims
+them to the part of the page the builder parses (the headline ``<h1>`` through
+the end of the listing details ``<dl>``) and compresses them. The encoding and
+compression are recorded next to the data so the builder can decode it.
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import os
+import re
+from typing import Any
+
+# "gzip" (default), "zstd" (needs the optional zstandard package) or "none"
+COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "gzip")
+
+DETAILS_START = re.compile(rb"<dl\b[^>]*\bclassified-details\b", re.IGNORECASE)
+DL_TAG = re.compile(rb"<(/?)dl\b", re.IGNORECASE)
+H1_START = re.compile(rb"<h1\b", re.IGNORECASE)
+
+# Trimming searches the raw bytes for ASCII tags, so it is only safe for
+# encodings where ASCII characters are single bytes.
+_WIDE_ENCODINGS = ("utf-16", "utf_16", "utf-32", "utf_32")
+
+
+def trim_listing(raw: bytes, encoding: str = "utf-8") -> bytes:
+    """
+    Return the slice of ``raw`` from the last ``<h1>`` before the listing
+    details block to the end of that block, or ``raw`` unchanged when the
+    block cannot be found.
+    """
+    if encoding.lower().startswith(_WIDE_ENCODINGS):
+        return raw
+
+    start = DETAILS_START.search(raw)
+    if start is None:
+        return raw
+
+    depth = 0
+    end = None
+    for tag in DL_TAG.finditer(raw, start.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            close = raw.find(b">", tag.end())
+            end = len(raw) if close == -1 else close + 1
+            break
+    if end is None:
+        return raw
+
+    headlines = list(H1_START.finditer(raw, 0, start.start()))
+    return raw[headlines[-1].start() if headlines else start.start() : end]
+
+
+def compress(data: bytes, method: str = COMPRESSION) -> bytes:
+    if method == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if method == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    if method == "none":
+        return data
+    raise ValueError(f"Unknown payload compression: {method}")
+
+
+def decompress(data: bytes, method: str) -> bytes:
+    if method == "gzip":
+        return gzip.decompress(data)
+    if method == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    if method == "none":
+        return data
+    raise ValueError(f"Unknown payload compression: {method}")
+
+
+def encode_html(raw: bytes, encoding: str, compression: str = COMPRESSION) -> dict[str, Any]:
+    """Pack raw HTML bytes into a JSON-safe payload."""
+    return {
+        "data": base64.b64encode(compress(raw, compression)).decode("ascii"),
+        "encoding": encoding,
+        "compression": compression,
+    }
+
+
+def decode_html(payload: dict[str, Any], data: bytes | None = None) -> str:
+    """
+    Unpack a payload built by ``encode_html`` into text. ``data`` overrides the
+    inline base64 data, e.g. when the compressed bytes were stored in S3.
+    """
+    if data is None:
+        data = base64.b64decode(payload["data"])
+    raw = decompress(data, payload.get("compression", "none"))
+    return raw.decode(payload.get("encoding") or "utf-8", errors="replace")
@@ -0,0 +1,243 @@
+"""
+Listing messages on the scraper queue, with S3 offload for large payloads.
+
+Messages carry the listing HTML as a compact payload (see ``shared.payload``)
+under ``html_payload``, or an ``html_s3`` pointer to the compressed bytes when
+even that is too large. Messages with plain ``html_content`` are still read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from functools import cache
+from typing import Any
+
+from .metrics import incr, span
+from .payload import COMPRESSION, compress, decode_html, encode_html
+
+# SQS rejects messages (and whole SendMessageBatch requests) above 256 KB.
+MAX_MESSAGE_BYTES = 256 * 1024
+MAX_BATCH_ENTRIES = 10
+PAYLOAD_PREFIX = "html/"
+
+logger = logging.getLogger(__name__)
+
+_client_lock = threading.Lock()
+
+
+def get_client(service: str):
+    """A boto3 client for ``service``, created once per process and shared by all threads."""
+    # Creating clients from boto3's default session is not thread-safe, and
+    # builder worker threads resolve S3 pointers concurrently.
+    with _client_lock:
+        return _create_client(service)
+
+
+@cache
+def _create_client(service: str):
+    # boto3 costs well over 100 ms to import; consumers only need it when a
+    # message points at S3, so it is not imported until a client is required.
+    import boto3
+
+    return boto3.client(service)
+
+
+def payload_key(html: bytes | str) -> str:
+    """Content-addressed S3 key for an HTML payload."""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return f"{PAYLOAD_PREFIX}{hashlib.sha256(html).hexdigest()}.html"
+
+
+def resolve_html(message: dict[str, Any], s3=None) -> dict[str, Any]:
+    """
+    Replace a compact ``html_payload`` or an ``html_s3`` pointer in ``message``
+    with the decoded ``html_content`` the builder parses.
+    """
+    payload = message.pop("html_payload", None)
+    if payload is not None:
+        message["html_content"] = decode_html(payload)
+
+    pointer = message.pop("html_s3", None)
+    if pointer is not None:
+        s3 = s3 or get_client("s3")
+        obj = s3.get_object(Bucket=pointer["bucket"], Key=pointer["key"])
+        message["html_content"] = decode_html(pointer, data=obj["Body"].read())
+    return message
+
+
+def load_message(body: str, s3=None) -> dict[str, Any]:
+    """
+    Decode a queue message body into a builder event, fetching the HTML from S3
+    when the producer offloaded it.
+    """
+    return resolve_html(json.loads(body), s3=s3)
+
+
+class BatchProducer:
+    """
+    Buffers listing messages and sends them with ``send_message_batch``.
+
+    Batches are flushed at 10 entries or when the next message would push the
+    request over the SQS size limit. Entries that fail for a non-sender reason
+    (throttling, internal errors) are retried with jittered exponential backoff.
+    HTML payloads too large for a message are written to ``bucket`` under a
+    content-addressed key and the message carries a pointer instead.
+
+    ``send`` returns a future that resolves to whether the message reached the
+    queue once its batch has been flushed.
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        sqs=None,
+        s3=None,
+        bucket: str | None = None,
+        max_attempts: int = 5,
+        base_delay: float = 0.2,
+        compression: str = COMPRESSION,
+    ):
+        self.queue_url = queue_url
+        self.sqs = sqs or get_client("sqs")
+        self.bucket = bucket if bucket is not None else os.getenv("PAYLOAD_BUCKET")
+        self._s3 = s3
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.compression = compression
+
+        self.sent = 0
+        self.offloaded = 0
+        self.failed: list[dict[str, Any]] = []
+        self._batch: list[dict[str, str]] = []
+        self._batch_bytes = 0
+        self._deliveries: dict[str, Future[bool]] = {}
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = get_client("s3")
+        return self._s3
+
+    def build_body(self, listing_id: str, html: bytes, encoding: str = "utf-8") -> str:
+        payload = encode_html(html, encoding, self.compression)
+        body = json.dumps({"listing_id": listing_id, "html_payload": payload})
+        if len(body.encode("utf-8")) <= MAX_MESSAGE_BYTES:
+            return body
+
+        if not self.bucket:
+            raise ValueError(
+                f"Listing {listing_id} exceeds {MAX_MESSAGE_BYTES} bytes and "
+                "PAYLOAD_BUCKET is not set"
+            )
+        key = payload_key(html)
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=compress(html, self.compression),
+            ContentType=f"text/html; charset={encoding}",
+        )
+        self.offloaded += 1
+        pointer = {
+            "bucket": self.bucket,
+            "key": key,
+            "encoding": encoding,
+            "compression": self.compression,
+        }
+        return json.dumps({"listing_id": listing_id, "html_s3": pointer})
+
+    def send(self, listing_id: str, html: bytes | str, encoding: str = "utf-8") -> Future[bool]:
+        """
+        Queue a listing for the consumer, flushing a full batch if needed.
+        Returns a future for the message's delivery. A listing that cannot be
+        turned into a message (too large without a bucket, or its S3 upload
+        failed) fails on its own rather than stopping the caller.
+        """
+        if isinstance(html, str):
+            html, encoding = html.encode("utf-8"), "utf-8"
+        try:
+            body = self.build_body(listing_id, html, encoding)
+        except Exception as exc:
+            logger.warning("Error building message for listing %s: %s", listing_id, exc)
+            self.failed.append({"Id": listing_id, "Message": str(exc)})
+            failed: Future[bool] = Future()
+            failed.set_result(False)
+            return failed
+        size = len(body.encode("utf-8"))
+        incr("message_bytes", size)
+        if self._batch and self._batch_bytes + size > MAX_MESSAGE_BYTES:
+            self.flush()
+
+        entry_id = str(len(self._batch))
+        delivery: Future[bool] = Future()
+        self._batch.append({"Id": entry_id, "MessageBody": body})
+        self._deliveries[entry_id] = delivery
+        self._batch_bytes += size
+        if len(self._batch) >= MAX_BATCH_ENTRIES:
+            self.flush()
+        return delivery
+
+    def flush(self) -> None:
+        """Send the buffered batch, retrying entries that failed transiently."""
+        if not self._batch:
+            return
+        entries, self._batch, self._batch_bytes = self._batch, [], 0
+        deliveries, self._deliveries = self._deliveries, {}
+        try:
+            self._send_entries(entries, deliveries)
+        finally:
+            # Anything not confirmed as sent (including on an exception) failed.
+            for delivery in deliveries.values():
+                if not delivery.done():
+                    delivery.set_result(False)
+
+    def _send_entries(
+        self, entries: list[dict[str, str]], deliveries: dict[str, Future[bool]]
+    ) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with span("sqs_send"):
+                    response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as exc:
+                if attempt == self.max_attempts:
+                    logger.warning("Error sending batch to queue: %s", exc)
+                    self.failed.extend({"Id": e["Id"], "Message": str(exc)} for e in entries)
+                    return
+                self._backoff(attempt)
+                continue
+
+            successful = response.get("Successful", [])
+            self.sent += len(successful)
+            for success in successful:
+                deliveries[success["Id"]].set_result(True)
+            retryable = []
+            for failure in response.get("Failed", []):
+                if failure.get("SenderFault") or attempt == self.max_attempts:
+                    logger.warning(
+                        "Error sending message %s: %s", failure["Id"], failure.get("Message")
+                    )
+                    self.failed.append(failure)
+                else:
+                    retryable.append(failure["Id"])
+
+            if not retryable:
+                return
+            entries = [e for e in entries if e["Id"] in retryable]
+            self._backoff(attempt)
+
+    def _backoff(self, attempt: int) -> None:
+        # Full jitter: sleep somewhere in [0, base * 2^attempt)
+        time.sleep(random.uniform(0, self.base_delay * 2**attempt))
+
+    def __enter__(self) -> BatchProducer:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
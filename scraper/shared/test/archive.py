@@ -0,0 +1,90 @@
+"""Checks for the content-addressed snapshot archive."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from datetime import UTC, datetime, timedelta
+
+from shared.archive import MANIFEST, Archive
+
+
+def test_round_trip_and_dedup() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        with Archive(root, segment_bytes=64) as archive:
+            archive.add("1", "https://example.com/1/", b"<h1>one</h1>")
+            archive.add("2", "https://example.com/2/", "<h1>café</h1>".encode("latin-1"), "latin-1")
+            # Same body again for the same listing: skipped entirely.
+            archive.add("1", "https://example.com/1/", b"<h1>one</h1>")
+            # Same body under another listing: indexed, but stored once.
+            archive.add("3", "https://example.com/3/", b"<h1>one</h1>")
+
+        assert (archive.added, archive.duplicates) == (2, 2)
+        reader = Archive(root)
+        entries = list(reader.entries())
+        assert [e["listing_id"] for e in entries] == ["1", "2", "3"]
+        assert entries[2]["segment"] == entries[0]["segment"]
+        assert reader.read(entries[1]).decode("latin-1") == "<h1>café</h1>"
+
+
+def test_latest_snapshot_wins() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        for version in (b"v1", b"v2", b"v1"):
+            with Archive(root) as archive:
+                archive.add("1", "https://example.com/1/", version)
+
+        reader = Archive(root)
+        assert len(reader.segments()) == 3
+        assert reader.read(reader.latest()["1"]) == b"v1"
+
+        # Only the latest blob of each listing is remembered, so going back to
+        # an older body stores it again.
+        entries = list(reader.entries())
+        assert len({e["segment"] for e in entries}) == 3
+        assert [raw for _, raw in reader.read_many(entries[:1])] == [b"v1"]
+
+
+def test_writers_read_only_the_manifest() -> None:
+    with tempfile.TemporaryDirectory() as root:
+        with Archive(root) as archive:
+            archive.add("1", "https://example.com/1/", b"one")
+            archive.add("2", "https://example.com/2/", b"two")
+
+        # Dedup survives without the segment indexes.
+        for name in os.listdir(os.path.join(root, "index")):
+            os.remove(os.path.join(root, "index", name))
+        with Archive(root) as archive:
+            archive.add("1", "https://example.com/1/", b"one")
+            archive.add("3", "https://example.com/3/", b"two")
+        assert (archive.added, archive.duplicates) == (0, 2)
+
+        # Listings not archived within the window drop out of the manifest.
+        path = os.path.join(root, MANIFEST)
+        with open(path) as f:
+            manifest = json.load(f)
+        old = (datetime.now(UTC) - timedelta(days=365)).isoformat()
+        manifest["listings"]["2"]["fetched_at"] = old
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+        with Archive(root) as archive:
+            archive.add("4", "https://example.com/4/", b"four")
+        with open(path) as f:
+            assert sorted(json.load(f)["listings"]) == ["1", "3", "4"]
+
+
+def main() -> int:
+    for test in (
+        test_round_trip_and_dedup,
+        test_latest_snapshot_wins,
+        test_writers_read_only_the_manifest,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All archive checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
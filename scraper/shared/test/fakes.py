@@ -0,0 +1,127 @@
+"""In-process stand-ins for the AWS clients used by the scraper."""
+
+from __future__ import annotations
+
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any
+
+
+class FakeSQS:
+    """
+    Minimal SQS client. ``fail_next`` holds ``(code, sender_fault)`` tuples that
+    are applied, one per entry, to the next entries sent.
+    """
+
+    def __init__(self):
+        self.messages: deque[dict[str, Any]] = deque()
+        self.batch_calls: list[list[dict[str, str]]] = []
+        self.fail_next: deque[tuple[str, bool]] = deque()
+
+    def send_message_batch(self, QueueUrl: str, Entries: list[dict[str, str]]):
+        if len(Entries) > 10:
+            raise ValueError("TooManyEntriesInBatchRequest")
+        if sum(len(e["MessageBody"].encode("utf-8")) for e in Entries) > 256 * 1024:
+            raise ValueError("BatchRequestTooLong")
+
+        self.batch_calls.append(Entries)
+        successful, failed = [], []
+        for entry in Entries:
+            if self.fail_next:
+                code, sender_fault = self.fail_next.popleft()
+                failed.append(
+                    {"Id": entry["Id"], "Code": code, "SenderFault": sender_fault, "Message": code}
+                )
+                continue
+            message_id = str(uuid.uuid4())
+            self.messages.append(
+                {"MessageId": message_id, "Body": entry["MessageBody"], "QueueUrl": QueueUrl}
+            )
+            successful.append({"Id": entry["Id"], "MessageId": message_id})
+
+        response: dict[str, Any] = {"Successful": successful}
+        if failed:
+            response["Failed"] = failed
+        return response
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, **kwargs):  # noqa: ARG002
+        """Take up to ``MaxNumberOfMessages`` messages off the queue (no visibility timeout)."""
+        messages = []
+        while len(messages) < MaxNumberOfMessages:
+            try:
+                message = self.messages.popleft()
+            except IndexError:
+                break
+            messages.append({**message, "ReceiptHandle": message["MessageId"]})
+        return {"Messages": messages} if messages else {}
+
+
+class FakeS3:
+    """Minimal S3 client backed by a dict of ``(bucket, key) -> bytes``."""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs):  # noqa: ARG002
+        self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def get_object(self, Bucket: str, Key: str):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+# Packed prompts number their descriptions "1. ...", separated by blank lines.
+PACKED_ITEM = re.compile(r"(?:^|\n\n)\d+\. ")
+
+
+class FakeBedrock:
+    """
+    Minimal Bedrock runtime client. ``converse`` answers with ``fields`` (one
+    object per numbered description for packed prompts) after ``latency``
+    seconds, and raises ThrottlingException for a ``throttle_rate`` fraction
+    of calls.
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, Any] | None = None,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.fields = fields if fields is not None else {"furnished": True}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def converse(self, modelId: str, messages, system, **kwargs):  # noqa: ARG002
+        from botocore.exceptions import ClientError
+
+        with self._lock:
+            self.calls += 1
+            throttled = self._random.random() < self.throttle_rate
+            self.throttled += throttled
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "Converse"
+            )
+
+        text = messages[-1]["content"][0]["text"]
+        if "json array" in system[0]["text"]:
+            answer: Any = [self.fields] * len(PACKED_ITEM.findall(text))
+        else:
+            answer = self.fields
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": json.dumps(answer)}]}}
+        }
@@ -0,0 +1,66 @@
+"""Checks for the postings index bootstrap."""
+
+from __future__ import annotations
+
+import mongomock
+from pymongo.errors import OperationFailure
+
+from shared import indexes, mongo
+
+
+def test_cold_start_skips_unique_indexes_and_failures() -> None:
+    collection = mongomock.MongoClient().db.postings
+    collection.insert_many([{"listing_id": "1"}, {"listing_id": "1"}])
+
+    ensured = indexes._ensured
+    try:
+        indexes._ensured = False
+        indexes.ensure_indexes_once(collection)
+        created = set(collection.index_information())
+        assert "listing_id__id" in created
+        assert "listing_id_unique" not in created
+
+        def fail(_indexes):
+            raise OperationFailure("Index already exists with a different name", code=85)
+
+        collection.create_indexes = fail
+        indexes._ensured = False
+        indexes.ensure_indexes_once(collection)
+        assert indexes._ensured
+    finally:
+        indexes._ensured = ensured
+
+
+def test_migration_dedupes_before_unique_index() -> None:
+    previous, mongo._client = mongo._client, mongomock.MongoClient()
+    try:
+        collection = mongo.get_database(mongo._client)
+        collection.insert_many(
+            [{"listing_id": "1", "v": 1}, {"listing_id": "1", "v": 2}, {"listing_id": "2"}]
+        )
+
+        assert indexes.migrate(collection) == 1
+        assert "listing_id_unique" not in collection.index_information()
+
+        assert indexes.main(["--dedupe"]) == 0
+        assert mongo._client is None
+        assert [doc["v"] for doc in collection.find({"listing_id": "1"})] == [2]
+        assert collection.index_information()["listing_id_unique"]["unique"]
+    finally:
+        mongo._client = previous
+
+
+def main() -> int:
+    for test in (
+        test_cold_start_skips_unique_indexes_and_failures,
+        test_migration_dedupes_before_unique_index,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All index checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""Checks for the span and counter instrumentation."""
+
+from __future__ import annotations
+
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.metrics import Metrics
+
+
+def test_disabled_is_a_no_op() -> None:
+    metrics = Metrics(enabled=False)
+    with metrics.span("fetch"):
+        metrics.incr("pages")
+
+    def work() -> int:
+        return 1
+
+    assert metrics.timed()(work) is work
+    assert metrics.invocation("builder")(work) is work
+    assert metrics.snapshot() == {}
+    assert metrics.emit("builder") is None
+
+
+def test_counters_and_stage_spans() -> None:
+    metrics = Metrics(enabled=True, sample_rate=1.0)
+    metrics.incr("pages")
+    metrics.incr("fetched_bytes", 512)
+    with metrics.span("parse"):
+        pass
+    with metrics.span("parse"):
+        pass
+
+    values = metrics.snapshot()
+    assert values["pages"] == 1
+    assert values["fetched_bytes"] == 512
+    assert values["parse_calls"] == 2
+    assert values["parse_ms"] >= 0
+
+
+def test_sampled_spans() -> None:
+    never = Metrics(enabled=True, sample_rate=0.0)
+    for _ in range(10):
+        with never.span("parse_listing", sample=True):
+            pass
+    assert never.snapshot() == {}
+
+    always = Metrics(enabled=True, sample_rate=1.0)
+    for _ in range(10):
+        with always.span("parse_listing", sample=True):
+            pass
+    assert len(always.snapshot()["parse_listing_sample_ms"]) == 10
+
+
+def test_emits_one_emf_line_per_invocation() -> None:
+    metrics = Metrics(enabled=True, sample_rate=1.0, fmt="emf", namespace="Test")
+    stream = io.StringIO()
+
+    @metrics.invocation("builder")
+    def inner() -> None:
+        metrics.incr("listings")
+
+    @metrics.invocation("crawler")
+    def outer() -> None:
+        inner()
+        inner()
+
+    # Route the automatic emit to our stream.
+    metrics.emit = lambda function, stream=stream, emit=metrics.emit: emit(function, stream)
+    outer()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    line = json.loads(lines[0])
+    assert line["function"] == "crawler"
+    assert line["listings"] == 2
+    assert line["invocation_calls"] == 1
+    (directive,) = line["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "Test"
+    units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+    assert units["listings"] == "Count"
+    assert units["invocation_ms"] == "Milliseconds"
+    # Emitting resets for the next invocation.
+    assert metrics.snapshot() == {}
+
+
+def test_entry_points_on_other_threads_share_the_line() -> None:
+    metrics = Metrics(enabled=True, sample_rate=1.0, fmt="json")
+    stream = io.StringIO()
+    metrics.emit = lambda function, stream=stream, emit=metrics.emit: emit(function, stream)
+
+    @metrics.invocation("builder")
+    def handler() -> None:
+        metrics.incr("listings")
+
+    @metrics.invocation("loadtest")
+    def run() -> None:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(64):
+                executor.submit(handler)
+
+    run()
+    (line,) = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert line["function"] == "loadtest"
+    assert line["listings"] == 64
+    assert line["invocation_calls"] == 1
+
+    # Overlapping top-level calls are merged; nothing is dropped or emitted twice.
+    stream.truncate(0)
+    stream.seek(0)
+    barrier = threading.Barrier(4)
+
+    @metrics.invocation("builder")
+    def overlapping() -> None:
+        barrier.wait()
+        metrics.incr("listings")
+
+    threads = [threading.Thread(target=overlapping) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert sum(line.get("listings", 0) for line in lines) == 4
+    assert metrics.snapshot() == {}
+
+
+def main() -> int:
+    for test in (
+        test_disabled_is_a_no_op,
+        test_counters_and_stage_spans,
+        test_sampled_spans,
+        test_emits_one_emf_line_per_invocation,
+        test_entry_points_on_other_threads_share_the_line,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All metrics checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
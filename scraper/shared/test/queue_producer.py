@@ -0,0 +1,126 @@
+"""Checks for the batch SQS producer against in-process fakes."""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.queue import MAX_MESSAGE_BYTES, BatchProducer, get_client, load_message, payload_key
+from shared.test.fakes import FakeS3, FakeSQS
+
+QUEUE_URL = "https://sqs.local/queue"
+BUCKET = "payloads"
+
+
+def make_producer(sqs: FakeSQS, s3: FakeS3) -> BatchProducer:
+    return BatchProducer(QUEUE_URL, sqs=sqs, s3=s3, bucket=BUCKET, base_delay=0, compression="gzip")
+
+
+def test_batches_of_ten() -> None:
+    sqs, s3 = FakeSQS(), FakeS3()
+    with make_producer(sqs, s3) as producer:
+        for i in range(25):
+            producer.send(str(i), f"<html>{i}</html>")
+
+    assert [len(call) for call in sqs.batch_calls] == [10, 10, 5]
+    assert producer.sent == 25
+    assert not producer.failed
+    bodies = [load_message(m["Body"], s3=s3) for m in sqs.messages]
+    assert [b["listing_id"] for b in bodies] == [str(i) for i in range(25)]
+
+
+def test_retries_transient_failures() -> None:
+    sqs, s3 = FakeSQS(), FakeS3()
+    sqs.fail_next.extend([("ServiceUnavailable", False), ("InvalidMessageContents", True)])
+    with make_producer(sqs, s3) as producer:
+        deliveries = [producer.send(str(i), "<html></html>") for i in range(3)]
+        assert not any(delivery.done() for delivery in deliveries)
+
+    # First call: 1 sent, 1 retryable, 1 sender fault. Second call: the retry.
+    assert [len(call) for call in sqs.batch_calls] == [3, 1]
+    assert producer.sent == 2
+    assert [f["Code"] for f in producer.failed] == ["InvalidMessageContents"]
+    assert [delivery.result() for delivery in deliveries] == [True, False, True]
+
+
+def test_compresses_payloads() -> None:
+    sqs, s3 = FakeSQS(), FakeS3()
+    html = "<html>" + "<p>caf\u00e9</p>" * 50_000 + "</html>"
+    with make_producer(sqs, s3) as producer:
+        producer.send("latin", html.encode("latin-1"), "latin-1")
+
+    body = sqs.messages[0]["Body"]
+    assert len(body) < len(html) // 10
+    assert json.loads(body)["html_payload"]["encoding"] == "latin-1"
+    assert load_message(body) == {"listing_id": "latin", "html_content": html}
+
+
+def test_offloads_large_payloads() -> None:
+    sqs, s3 = FakeSQS(), FakeS3()
+    # Random text does not compress below the message limit.
+    html = "<html>" + base64.b64encode(os.urandom(MAX_MESSAGE_BYTES)).decode() + "</html>"
+    with make_producer(sqs, s3) as producer:
+        producer.send("big", html)
+        producer.send("small", "<html></html>")
+
+    assert producer.offloaded == 1
+    assert (BUCKET, payload_key(html)) in s3.objects
+    pointer = json.loads(sqs.messages[0]["Body"])
+    assert pointer["html_s3"] == {
+        "bucket": BUCKET,
+        "key": payload_key(html),
+        "encoding": "utf-8",
+        "compression": "gzip",
+    }
+    assert load_message(sqs.messages[0]["Body"], s3=s3) == {
+        "listing_id": "big",
+        "html_content": html,
+    }
+
+
+def test_unsendable_listing_fails_alone() -> None:
+    class BrokenS3(FakeS3):
+        def put_object(self, **kwargs):  # noqa: ARG002
+            raise OSError("S3 unavailable")
+
+    html = "<html>" + base64.b64encode(os.urandom(MAX_MESSAGE_BYTES)).decode() + "</html>"
+    for producer in (
+        BatchProducer(QUEUE_URL, sqs=FakeSQS(), s3=FakeS3(), bucket="", base_delay=0),
+        BatchProducer(QUEUE_URL, sqs=FakeSQS(), s3=BrokenS3(), bucket=BUCKET, base_delay=0),
+    ):
+        with producer:
+            big = producer.send("big", html)
+            small = producer.send("small", "<html></html>")
+        assert big.result() is False
+        assert small.result() is True
+        assert [failure["Id"] for failure in producer.failed] == ["big"]
+
+
+def test_clients_are_shared_across_threads() -> None:
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: get_client("s3"), range(32)))
+    assert len({id(client) for client in clients}) == 1
+    assert get_client("sqs") is not clients[0]
+
+
+def main() -> int:
+    for test in (
+        test_batches_of_ten,
+        test_retries_transient_failures,
+        test_compresses_payloads,
+        test_offloads_large_payloads,
+        test_unsendable_listing_fails_alone,
+        test_clients_are_shared_across_threads,
+    ):
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("All producer checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())